@@ -0,0 +1,279 @@
+"""HTTP API next to the Streamlit UI, sharing its model, batcher and cache.
+
+    uvicorn api:create_app --factory --port 8000
+
+    POST /predict        multipart field "file": one image -> JSON prediction
+    POST /predict/bulk   multipart field "files": images and/or .zip archives
+                         -> NDJSON, one line per image, streamed per batch
+    GET  /healthz        process is up
+    GET  /readyz         model is loaded and warm (503 before that)
+                         (also written to SKIN_API_READY_FILE for startup.py --probe)
+    GET  /metrics        Prometheus text: stage histograms, cache, batcher, API gauges
+
+Every prediction goes through the same MicroBatcher as the Streamlit
+sessions, so API and UI requests are coalesced into shared forward passes.
+Uploads are bounded by SKIN_API_MAX_UPLOAD_MB / SKIN_API_MAX_BULK_MB (413),
+and at most SKIN_API_MAX_CONCURRENCY requests are in flight; beyond that, or
+when the batcher queue is full, requests are answered with 429 and a
+Retry-After header instead of piling up.
+
+FastAPI is only needed for this module (pip install fastapi python-multipart);
+tests/test_api.py drives create_app() in-process with
+fastapi.testclient.TestClient and httpx.ASGITransport.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import queue
+import zipfile
+from contextlib import asynccontextmanager
+
+import anyio
+from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from batch_infer import IMAGE_EXTENSIONS
+from decode import ImageTooLarge, decode
+from disease_info import class_names, disease_descriptions, disease_lab_tests
+from inference_server import get_batcher
+from instrumentation import get_tracer
+from model_store import DEFAULT_MODEL_PATH, get_store
+from pipeline import prefetch_batches
+from postprocess import DEFAULT_TOP_K, summarize
+from prediction_cache import get_prediction_cache
+from startup import report as startup_report
+
+MB = 1024 * 1024
+DEFAULT_MAX_UPLOAD_BYTES = int(float(os.environ.get("SKIN_API_MAX_UPLOAD_MB", 20)) * MB)
+DEFAULT_MAX_BULK_BYTES = int(float(os.environ.get("SKIN_API_MAX_BULK_MB", 200)) * MB)
+DEFAULT_MAX_BULK_FILES = int(os.environ.get("SKIN_API_MAX_BULK_FILES", 1000))
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("SKIN_API_MAX_CONCURRENCY", 8))
+DEFAULT_BULK_BATCH_SIZE = int(os.environ.get("SKIN_API_BULK_BATCH", 16))
+RETRY_AFTER_SECONDS = 1
+# not the Streamlit app's SKIN_READY_FILE: on a host running both, one must not mark the other ready
+READY_FILE = os.environ.get("SKIN_API_READY_FILE", "/tmp/skin-classifier-api.ready")
+
+
+class Busy(Exception):
+    """Raised when a request cannot be admitted; answered with 429."""
+
+
+class _Limiter:
+    """Non-blocking admission control: a request either gets a slot now or is rejected."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.counters = {"admitted": 0, "rejected": 0}
+
+    def acquire(self):
+        if self.in_flight >= self.limit:
+            self.counters["rejected"] += 1
+            raise Busy(f"{self.in_flight} requests in flight")
+        self.in_flight += 1
+        self.counters["admitted"] += 1
+
+    def release(self):
+        self.in_flight -= 1
+
+
+def describe(prediction):
+    return dict(prediction.to_dict(),
+                description=disease_descriptions.get(prediction.label),
+                lab_tests=disease_lab_tests.get(prediction.label))
+
+
+async def _read_limited(upload, limit):
+    data = await upload.read(limit + 1)
+    if len(data) > limit:
+        raise HTTPException(413, f"{upload.filename} is larger than {limit // MB} MB")
+    return data
+
+
+def _bulk_items(uploads, max_files, max_bytes):
+    """[(name, read())] for every image in the uploads, expanding .zip archives lazily."""
+    items, total = [], 0
+    for name, data in uploads:
+        if name.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(data))
+            except zipfile.BadZipFile as exc:
+                raise HTTPException(400, f"{name}: {exc}")
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                # declared sizes, so a zip bomb is refused before anything is inflated
+                total += info.file_size
+                items.append((f"{name}/{info.filename}", lambda a=archive, i=info: a.read(i)))
+        else:
+            total += len(data)
+            items.append((name, lambda d=data: d))
+        if len(items) > max_files:
+            raise HTTPException(413, f"more than {max_files} images in one request")
+        if total > max_bytes:
+            raise HTTPException(413, f"uncompressed upload is larger than {max_bytes // MB} MB")
+    return items
+
+
+def create_app(model_path=DEFAULT_MODEL_PATH, max_upload_bytes=DEFAULT_MAX_UPLOAD_BYTES,
+               max_bulk_bytes=DEFAULT_MAX_BULK_BYTES, max_bulk_files=DEFAULT_MAX_BULK_FILES,
+               max_concurrency=DEFAULT_MAX_CONCURRENCY, bulk_batch_size=DEFAULT_BULK_BATCH_SIZE):
+    store = get_store(model_path)
+    limiter = _Limiter(max_concurrency)
+    prediction_cache = get_prediction_cache()
+    tracer = get_tracer()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # load and warm up before accepting traffic, /readyz reports 503 until then
+        with startup_report.phase("load_model"):
+            await run_in_threadpool(store.get)
+            await run_in_threadpool(store.backend)
+        startup_report.mark_ready(READY_FILE, model=store.stats())
+        yield
+
+    app = FastAPI(title="Skin disease classifier", lifespan=lifespan)
+
+    def model_id():
+        return f"{store.fingerprint}:{store.backend().name}"
+
+    async def forward(pixel_values):
+        # never block the event loop on a full batcher queue
+        try:
+            future = get_batcher(store).submit(pixel_values, block=False)
+        except queue.Full:
+            raise Busy("batcher queue is full")
+        return await asyncio.wrap_future(future)
+
+    @app.exception_handler(Busy)
+    async def busy(request, exc):
+        return JSONResponse({"detail": f"server busy: {exc}"}, status_code=429,
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+    @app.middleware("http")
+    async def limit_body(request, call_next):
+        # reject oversized bodies from the header before the multipart parser spools them
+        limit = max_bulk_bytes if request.url.path == "/predict/bulk" else max_upload_bytes
+        length = request.headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) > limit + 64 * 1024:
+            return JSONResponse({"detail": f"request body is larger than {limit // MB} MB"}, status_code=413)
+        return await call_next(request)
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    async def readyz():
+        state = startup_report.to_dict()
+        return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        gauges = {f"skin_cache_{k}": v for k, v in prediction_cache.stats().items()}
+        gauges.update({f"skin_batcher_{k}": v for k, v in get_batcher(store).stats().items()})
+        gauges.update({f"skin_model_{k}": v for k, v in store.stats().items()})
+        gauges.update({f"skin_api_{k}": v for k, v in limiter.counters.items()})
+        gauges["skin_api_in_flight"] = limiter.in_flight
+        return tracer.prometheus_text(gauges)
+
+    @app.get("/classes")
+    async def classes():
+        return {"classes": class_names}
+
+    @app.post("/predict")
+    async def predict(file: UploadFile = File(...), top_k: int = Query(DEFAULT_TOP_K, ge=1)):
+        limiter.acquire()
+        try:
+            data = await _read_limited(file, max_upload_bytes)
+            with tracer.trace("api_predict") as trace:
+                with trace.stage("cache_lookup") as rec:
+                    current_model = model_id()
+                    cached = prediction_cache.get(data, current_model)
+                    rec["hit"] = cached is not None
+                if cached is not None:
+                    logits = cached["logits"]
+                else:
+                    with trace.stage("decode") as rec:
+                        try:
+                            image = await run_in_threadpool(decode, data, store.fast_preprocessor().decode_size, info=rec)
+                        except ImageTooLarge as exc:
+                            raise HTTPException(413, f"{file.filename}: {exc}")
+                        except Exception as exc:
+                            raise HTTPException(400, f"{file.filename}: cannot read image ({exc})")
+                        rec["image_size"] = image.size
+                    with trace.stage("preprocess"):
+                        pixel_values = await run_in_threadpool(store.fast_preprocessor(), [image])
+                    with trace.stage("forward"):
+                        logits = (await forward(pixel_values))[0]
+                with trace.stage("postprocess"):
+                    prediction = summarize(logits, k=top_k, temperature=store.temperature)[0]
+                    if cached is None:
+                        prediction_cache.put(data, current_model, logits.numpy(), prediction.top_k)
+            return dict(describe(prediction), filename=file.filename)
+        finally:
+            limiter.release()
+
+    @app.post("/predict/bulk")
+    async def predict_bulk(request: Request, files: list[UploadFile] = File(...), top_k: int = Query(DEFAULT_TOP_K, ge=1)):
+        limiter.acquire()
+        try:
+            uploads = [(f.filename or f"file{i}", await _read_limited(f, max_bulk_bytes)) for i, f in enumerate(files)]
+            items = _bulk_items(uploads, max_bulk_files, max_bulk_bytes)
+        except BaseException:
+            limiter.release()
+            raise
+
+        fast = store.fast_preprocessor()
+        temperature = store.temperature
+
+        async def stream():
+            # decoding of the next batch overlaps with this batch's forward pass
+            batches = prefetch_batches(items, lambda item: fast.prepare(decode(item[1](), fast.decode_size)), batch_size=bulk_batch_size)
+            try:
+                while True:
+                    batch = await run_in_threadpool(next, batches, None)
+                    if batch is None:
+                        break
+                    ok_items, arrays, errors = batch
+                    lines = [{"filename": name, "error": f"{type(exc).__name__}: {exc}"} for (name, _), exc in errors]
+                    if arrays:
+                        try:
+                            logits = await forward(fast.to_tensor(arrays))
+                        except Busy as exc:
+                            lines += [{"filename": name, "error": f"server busy: {exc}"} for name, _ in ok_items]
+                        else:
+                            for (name, _), prediction in zip(ok_items, summarize(logits, k=top_k, temperature=temperature)):
+                                lines.append(dict(describe(prediction), filename=name))
+                    yield "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+                    if await request.is_disconnected():
+                        break
+            finally:
+                try:
+                    # closing joins the producer, which waits for the chunk being decoded: not on the
+                    # event loop; shielded, since a client disconnect cancels this generator
+                    with anyio.CancelScope(shield=True):
+                        await run_in_threadpool(batches.close)
+                finally:
+                    limiter.release()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the skin classifier over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(args.model_path), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Inference backends for the classifier: eager fp32, int8 dynamic quantization, ONNX Runtime.
+
+Every backend is a callable taking pixel_values (N, 3, H, W float32 tensor)
+and returning logits as a float32 tensor, so callers can switch between them
+with a single option (SKIN_BACKEND for the app, --backend for the tools).
+
+    python backends.py --verify imgs/ --model-path ./dinov2_skin_disease_model
+
+reports top-1 agreement and logit deviation of each backend against fp32.
+"""
+import argparse
+import copy
+import os
+import time
+
+import torch
+
+BACKENDS = ("eager", "int8", "onnx")
+DEFAULT_BACKEND = os.environ.get("SKIN_BACKEND", "eager")
+ONNX_CACHE_DIR = os.environ.get("SKIN_ONNX_DIR", "./.onnx_cache")
+
+
+class EagerBackend:
+    name = "eager"
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, pixel_values):
+        with torch.no_grad():
+            return self.model(pixel_values=pixel_values).logits
+
+
+class DynamicQuantBackend(EagerBackend):
+    """Linear layers quantized to int8 weights with activations quantized on the fly."""
+
+    name = "int8"
+
+    def __init__(self, model):
+        quantized = torch.ao.quantization.quantize_dynamic(copy.deepcopy(model), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized.eval())
+
+
+class _LogitsOnly(torch.nn.Module):
+    # onnx export wants plain tensors in and out
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+def export_onnx(model, path, input_size=(224, 224)):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    dummy = torch.zeros(1, 3, *input_size)
+    tmp = path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model).eval(), (dummy,), tmp,
+            input_names=["pixel_values"], output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17, dynamo=False,
+        )
+    os.replace(tmp, path)
+    return path
+
+
+class OnnxBackend:
+    """Runs an exported ONNX graph through onnxruntime on CPU."""
+
+    name = "onnx"
+
+    def __init__(self, model, onnx_path, input_size=(224, 224), threads=None):
+        import onnxruntime as ort
+
+        if not os.path.exists(onnx_path):
+            export_onnx(model, onnx_path, input_size)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, pixel_values):
+        logits = self.session.run(["logits"], {"pixel_values": pixel_values.contiguous().numpy()})[0]
+        return torch.from_numpy(logits)
+
+
+def create_backend(name, model, fingerprint=None, input_size=(224, 224)):
+    """Build the named backend around an eager model."""
+    if name == "eager":
+        return EagerBackend(model)
+    if name == "int8":
+        return DynamicQuantBackend(model)
+    if name == "onnx":
+        # the export is keyed by checkpoint fingerprint so new weights get a fresh graph
+        path = os.path.join(ONNX_CACHE_DIR, f"{fingerprint or 'model'}.onnx")
+        return OnnxBackend(model, path, input_size)
+    raise ValueError(f"unknown backend {name!r}, choose from {', '.join(BACKENDS)}")
+
+
+def verify(store, images, names=BACKENDS, batch_size=16):
+    """Compare each backend with fp32 eager on images; returns one report dict per backend."""
+    fast = store.fast_preprocessor()
+    batches = [fast(images[i:i + batch_size]) for i in range(0, len(images), batch_size)]
+    reference = torch.cat([store.backend("eager")(pv) for pv in batches])
+
+    reports = []
+    for name in names:
+        backend = store.backend(name)
+        backend(batches[0])  # warm-up
+        start = time.perf_counter()
+        logits = torch.cat([backend(pv) for pv in batches]).float()
+        elapsed = time.perf_counter() - start
+        deviation = (logits - reference).abs()
+        reports.append({
+            "backend": name,
+            "images": len(images),
+            "top1_agreement": (logits.argmax(-1) == reference.argmax(-1)).float().mean().item(),
+            "max_logit_deviation": deviation.max().item(),
+            "mean_logit_deviation": deviation.mean().item(),
+            "ms_per_image": 1000 * elapsed / max(1, len(images)),
+        })
+    return reports
+
+
+def main(argv=None):
+    from model_store import DEFAULT_MODEL_PATH, get_store
+    from batch_infer import find_images, load_image
+
+    parser = argparse.ArgumentParser(description="Compare inference backends against fp32 eager.")
+    parser.add_argument("--verify", required=True, metavar="DIR", help="held-out images to compare on")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    images = [load_image(path) for path in find_images(args.verify)]
+    if not images:
+        parser.error(f"no images found in {args.verify}")
+    reports = verify(get_store(args.model_path), images, args.backends.split(","), args.batch_size)
+    print(f"{'backend':8} {'top1 agree':>10} {'max dev':>9} {'mean dev':>9} {'ms/img':>8}")
+    for r in reports:
+        print(f"{r['backend']:8} {r['top1_agreement']:10.2%} {r['max_logit_deviation']:9.4f} "
+              f"{r['mean_logit_deviation']:9.4f} {r['ms_per_image']:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Headless batch classification of skin images.
+
+    python batch_infer.py /data/archive --output preds.csv --batch-size 32 --top-k 3
+    python batch_infer.py --manifest images.txt --output preds.parquet
+
+Predictions are appended as each batch finishes, so re-running the same
+command after a crash skips the images that already have a row.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import torch
+from backends import BACKENDS, DEFAULT_BACKEND
+from decode import decode
+from model_store import DEFAULT_MODEL_PATH, get_store
+from pipeline import prefetch_batches
+from postprocess import summarize
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def find_images(root):
+    paths = []
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(dirpath, name))
+    paths.sort()
+    return paths
+
+
+def read_manifest(path):
+    # plain text (one path per line) or a csv with a "path" column
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            return [row["path"] for row in csv.DictReader(f) if row.get("path")]
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def output_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".jsonl", ".parquet"):
+        return ext[1:]
+    raise ValueError(f"unsupported output format {ext!r}, use .csv, .jsonl or .parquet")
+
+
+def columns(top_k):
+    cols = ["path", "predicted_class", "confidence"]
+    for i in range(1, top_k + 1):
+        cols += [f"top{i}_label", f"top{i}_prob"]
+    return cols + ["error"]
+
+
+def flat_row(result, top_k):
+    row = {"path": result["path"], "predicted_class": result.get("predicted_class"),
+           "confidence": result.get("confidence"), "error": result.get("error")}
+    top = result.get("top_k", [])
+    for i in range(top_k):
+        row[f"top{i + 1}_label"] = top[i]["label"] if i < len(top) else None
+        row[f"top{i + 1}_prob"] = top[i]["prob"] if i < len(top) else None
+    return row
+
+
+def _truncate_partial_line(path):
+    # a crash can leave half a line at the end of the file, drop it
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+
+
+class PredictionWriter:
+    """Appends prediction rows to CSV, JSONL or a directory of Parquet parts."""
+
+    def __init__(self, path, top_k):
+        self.path = path
+        self.top_k = top_k
+        self.format = output_format(path)
+        self.parts_dir = path + ".parts"
+
+    def done_paths(self):
+        """Paths that already have a row from an earlier run."""
+        done = set()
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+            for part in glob.glob(os.path.join(self.parts_dir, "part-*.parquet")):
+                done.update(pq.read_table(part, columns=["path"]).column("path").to_pylist())
+            return done
+        if not os.path.exists(self.path):
+            return done
+        _truncate_partial_line(self.path)
+        with open(self.path, newline="", encoding="utf-8") as f:
+            if self.format == "csv":
+                done.update(row["path"] for row in csv.DictReader(f))
+            else:
+                done.update(json.loads(line)["path"] for line in f if line.strip())
+        return done
+
+    def write(self, results):
+        if self.format == "parquet":
+            self._write_parquet_part(results)
+            return
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            if self.format == "csv":
+                writer = csv.DictWriter(f, fieldnames=columns(self.top_k))
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(flat_row(r, self.top_k) for r in results)
+            else:
+                for r in results:
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_parquet_part(self, results):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(self.parts_dir, exist_ok=True)
+        index = len(glob.glob(os.path.join(self.parts_dir, "part-*.parquet")))
+        part = os.path.join(self.parts_dir, f"part-{index:06d}.parquet")
+        schema = pa.schema([(c, pa.float64() if c == "confidence" or c.endswith("_prob") else pa.string())
+                            for c in columns(self.top_k)])
+        table = pa.Table.from_pylist([flat_row(r, self.top_k) for r in results], schema=schema)
+        # write then rename so a crash never leaves a half-written part behind
+        pq.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)
+
+    def close(self):
+        if self.format != "parquet" or not os.path.isdir(self.parts_dir):
+            return
+        import pyarrow.parquet as pq
+        parts = sorted(glob.glob(os.path.join(self.parts_dir, "part-*.parquet")))
+        if parts:
+            pq.write_table(pq.ParquetDataset(parts).read(), self.path)
+
+
+def load_image(path, target=None):
+    # target (e.g. FastPreprocessor.decode_size) enables reduced-resolution JPEG decoding
+    return decode(path, target)
+
+
+def predict_batch(backend, pixel_values, top_k, temperature=1.0):
+    return [p.to_dict() for p in summarize(backend(pixel_values), top_k, temperature)]
+
+
+def run(paths, output, model_path=DEFAULT_MODEL_PATH, batch_size=32, top_k=3, workers=None, hf_preprocess=False,
+        backend_name=None, log_every=10):
+    writer = PredictionWriter(output, top_k)
+    done = writer.done_paths()
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} images, {len(done)} already done, {len(todo)} to classify", file=sys.stderr)
+
+    store = get_store(model_path)
+    image_processor, model = store.get()
+    backend = store.backend(backend_name)
+    if hf_preprocess:
+        def preprocess(path):
+            return image_processor(load_image(path), return_tensors="pt")["pixel_values"][0]
+        collate = torch.stack
+    else:
+        # workers only resize/crop as uint8, the batch is normalized in one pass
+        fast = store.fast_preprocessor()
+        def preprocess(path):
+            return fast.prepare(load_image(path, fast.decode_size))
+        try:
+            # this loop is done with each batch before it collates the next, so one output tensor is reused
+            out = torch.empty(batch_size, 3, *fast.output_size)
+        except ValueError:
+            out = None  # no center crop, the output size follows the aspect ratio
+        collate = lambda arrays: fast.to_tensor(arrays, out=out)
+
+    start = time.perf_counter()
+    processed = 0
+    # decoding and preprocessing of the next batch overlaps with this batch's forward pass
+    batches = prefetch_batches(todo, preprocess, batch_size=batch_size, workers=workers)
+    for batch_no, (ok_paths, tensors, errors) in enumerate(batches, 1):
+        # keep a row for unreadable files so resumed runs do not retry them forever
+        results = [{"path": path, "error": f"{type(exc).__name__}: {exc}"} for path, exc in errors]
+        if tensors:
+            for path, result in zip(ok_paths, predict_batch(backend, collate(tensors), top_k, store.temperature)):
+                results.append(dict({"path": path}, **result))
+        writer.write(results)
+
+        processed += len(ok_paths) + len(errors)
+        if batch_no % log_every == 0:
+            rate = processed / (time.perf_counter() - start)
+            print(f"{processed}/{len(todo)} images, {rate:.1f} images/s", file=sys.stderr)
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"done: {processed} images in {elapsed:.1f}s, {rate:.1f} images/s", file=sys.stderr)
+    return {"images": processed, "seconds": elapsed, "images_per_second": rate}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify a directory or manifest of skin images.")
+    parser.add_argument("input", nargs="?", help="directory to walk for .jpg/.jpeg/.png files")
+    parser.add_argument("--manifest", help="text file with one image path per line, or csv with a 'path' column")
+    parser.add_argument("--output", required=True, help="predictions file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="decode/preprocess threads (default: half the cores)")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="inference backend (default: SKIN_BACKEND or eager)")
+    parser.add_argument("--hf-preprocess", action="store_true",
+                        help="use the Hugging Face image processor instead of the fast batched path")
+    args = parser.parse_args(argv)
+
+    if bool(args.input) == bool(args.manifest):
+        parser.error("give either an input directory or --manifest")
+    try:
+        output_format(args.output)
+    except ValueError as exc:
+        parser.error(str(exc))
+    paths = read_manifest(args.manifest) if args.manifest else find_images(args.input)
+    run(paths, args.output, model_path=args.model_path, batch_size=args.batch_size, top_k=args.top_k,
+        workers=args.workers, hf_preprocess=args.hf_preprocess,
+        backend_name=args.backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Offline benchmark of the skin.py prediction path, stage by stage.
+
+Times image decode (decode.decode at the fast path's decode size, as the
+app, batch tool and API run it, next to a full-resolution decode for
+comparison), preprocessing (Hugging Face processor and the fast path), the
+forward pass and post-processing (softmax/argmax plus the
+class_names / disease_descriptions lookups) across batch sizes, input
+resolutions and torch thread counts, and writes p50/p95/p99 latency,
+throughput and peak RSS as JSON so runs can be diffed between checkpoints
+or library versions. The peak RSS high-water mark is reset before every
+configuration where the kernel allows it (Linux), so each one reports its
+own peak, and rss_delta_mb is that peak minus the RSS the configuration
+started from.
+
+    python bench.py --output bench.json
+    python bench.py --images imgs/ --batch-sizes 1,8 --threads 1,4 --backend int8
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+# never reach out to the Hugging Face hub while benchmarking
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import numpy as np
+import torch
+import transformers
+from PIL import Image
+
+from batch_infer import find_images
+from decode import decode
+from disease_info import class_names, disease_descriptions, disease_lab_tests
+from inference_server import percentile
+from model_store import DEFAULT_MODEL_PATH, get_store
+
+STAGES = ("decode_full", "decode", "preprocess_hf", "preprocess_fast", "forward", "postprocess")
+
+
+def synthetic_jpeg(width, height, seed):
+    # smooth random colour field, compresses like a photo rather than like noise
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(max(2, height // 32), max(2, width // 32), 3), dtype=np.uint8)
+    image = Image.fromarray(small).resize((width, height), Image.BICUBIC)
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def load_inputs(args):
+    """{label: [encoded image bytes]} for every resolution (and the bundled images if given)."""
+    inputs = {}
+    for spec in args.resolutions.split(","):
+        width, height = (int(v) for v in spec.lower().split("x"))
+        inputs[f"{width}x{height}"] = [synthetic_jpeg(width, height, seed) for seed in range(args.images_per_set)]
+    if args.images:
+        paths = find_images(args.images)
+        if paths:
+            inputs[os.path.basename(os.path.normpath(args.images))] = [open(p, "rb").read() for p in paths]
+    return inputs
+
+
+def _proc_status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """Reset the peak RSS high-water mark to the current RSS; False where that is not possible."""
+    try:
+        # Linux: writing 5 to clear_refs resets VmHWM
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def rss_mb():
+    return _proc_status_mb("VmRSS")
+
+
+def peak_rss_mb():
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    # ru_maxrss is KiB on Linux and bytes on macOS, and never goes down
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def summarize(seconds, images_per_call):
+    ms = [1000 * s for s in seconds]
+    total = sum(seconds)
+    return {
+        "calls": len(seconds),
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "mean_ms": total * 1000 / len(seconds),
+        "images_per_second": images_per_call * len(seconds) / total if total > 0 else None,
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def bench_config(store, backend, encoded, batch_size, repeats, warmup):
+    image_processor, _ = store.get()
+    fast = store.fast_preprocessor()
+    timings = {stage: [] for stage in STAGES}
+    batches = [encoded[i:i + batch_size] for i in range(0, len(encoded), batch_size)]
+    # only full batches, so every timing is for batch_size images
+    batches = [b for b in batches if len(b) == batch_size]
+
+    for run in range(warmup + repeats):
+        for batch in batches:
+            _, t_decode_full = timed(lambda: [Image.open(io.BytesIO(b)).convert("RGB") for b in batch])
+            images, t_decode = timed(lambda: [decode(b, fast.decode_size) for b in batch])
+            _, t_hf = timed(lambda: image_processor(images, return_tensors="pt"))
+            pixel_values, t_fast = timed(lambda: fast(images))
+            logits, t_forward = timed(lambda: backend(pixel_values))
+
+            def postprocess():
+                probs = logits.softmax(-1)
+                for idx in probs.argmax(-1).tolist():
+                    name = class_names[idx]
+                    disease_descriptions.get(name)
+                    disease_lab_tests.get(name)
+            _, t_post = timed(postprocess)
+
+            if run >= warmup:
+                for stage, t in zip(STAGES, (t_decode_full, t_decode, t_hf, t_fast, t_forward, t_post)):
+                    timings[stage].append(t)
+
+    result = {stage: summarize(seconds, len(batches[0])) for stage, seconds in timings.items()}
+    end_to_end = [sum(ts) for ts in zip(*(timings[s] for s in ("decode", "preprocess_fast", "forward", "postprocess")))]
+    result["end_to_end_fast"] = summarize(end_to_end, len(batches[0]))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the skin classifier pipeline on local CPU.")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backend", default=None, help="eager, int8 or onnx (default: SKIN_BACKEND or eager)")
+    parser.add_argument("--images", help="directory of real images to add as an extra input set, e.g. imgs/")
+    parser.add_argument("--resolutions", default="512x512,1024x768,3000x2000", help="synthetic JPEG sizes WxH")
+    parser.add_argument("--images-per-set", type=int, default=16)
+    parser.add_argument("--batch-sizes", default="1,4,16")
+    parser.add_argument("--threads", default=str(torch.get_num_threads()), help="comma separated torch thread counts")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", default="bench.json")
+    args = parser.parse_args(argv)
+
+    store = get_store(args.model_path)
+    backend = store.backend(args.backend)
+    inputs = load_inputs(args)
+
+    results, skipped = [], []
+    for threads in (int(v) for v in args.threads.split(",")):
+        torch.set_num_threads(threads)
+        for input_set, encoded in inputs.items():
+            for batch_size in (int(v) for v in args.batch_sizes.split(",")):
+                if batch_size > len(encoded):
+                    # a smaller batch would be reported as this batch size and not compare with the rest
+                    print(f"skipping input={input_set} batch={batch_size}: only {len(encoded)} images",
+                          file=sys.stderr)
+                    skipped.append({"threads": threads, "input_set": input_set, "batch_size": batch_size,
+                                    "images": len(encoded)})
+                    continue
+                # without a reset the peak is the process-wide maximum of all configurations so far
+                peak_scope = "config" if reset_peak_rss() else "process"
+                start_rss = rss_mb()
+                stages = bench_config(store, backend, encoded, batch_size, args.repeats, args.warmup)
+                peak = peak_rss_mb()
+                results.append({
+                    "threads": threads, "input_set": input_set, "batch_size": batch_size,
+                    "stages": stages, "peak_rss_mb": peak, "peak_rss_scope": peak_scope,
+                    "rss_delta_mb": None if start_rss is None or peak_scope != "config" else peak - start_rss,
+                })
+                e2e = stages["end_to_end_fast"]
+                print(f"threads={threads} input={input_set} batch={batch_size}: "
+                      f"p50 {e2e['p50_ms']:.1f}ms p99 {e2e['p99_ms']:.1f}ms "
+                      f"{e2e['images_per_second']:.1f} img/s", file=sys.stderr)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+        },
+        "model": {"path": args.model_path, "fingerprint": store.fingerprint, "backend": backend.name,
+                  "load": store.stats()},
+        "config": vars(args),
+        "results": results,
+        "skipped": skipped,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Continuous classification of a camera or video stream.
+
+Frames go through three cheap filters before the model sees them:
+
+1. a rate cap: at most max_fps frames per second are retrieved as images
+   (the others are only grabbed, which keeps a camera's buffer fresh and
+   skips the colour conversion and copy), so the model's CPU use does not
+   grow with the input rate;
+2. a frame-difference gate: the frame is shrunk to a 32x32 grayscale
+   thumbnail and compared with the thumbnail of the last classified frame;
+   a held-still camera produces near-identical frames that are skipped;
+3. the shared MicroBatcher, so stream frames and uploads share forward passes.
+
+The class shown is smoothed over a sliding window of the last classified
+frames (mean probability), so it does not flicker between two neighbours.
+
+    python camera_stream.py --source 0            # first camera
+    python camera_stream.py --source lesion.mp4   # video file, played at its own frame rate
+
+Needs OpenCV (pip install opencv-python-headless).
+"""
+import argparse
+import sys
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+from postprocess import probabilities, summarize
+
+DEFAULT_MAX_FPS = 2.0
+DEFAULT_DIFF_THRESHOLD = 4.0  # mean absolute difference of the 32x32 thumbnails, 0-255
+DEFAULT_WINDOW = 5
+THUMBNAIL = (32, 32)
+
+
+def thumbnail(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMBNAIL, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class StreamClassifier:
+    """Turns a sequence of BGR frames into smoothed Predictions, classifying as few frames as possible."""
+
+    def __init__(self, store, batcher, max_fps=DEFAULT_MAX_FPS, diff_threshold=DEFAULT_DIFF_THRESHOLD,
+                 window=DEFAULT_WINDOW):
+        self.store = store
+        self.batcher = batcher
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.diff_threshold = diff_threshold
+        self.window = deque(maxlen=window)
+        self._last_thumb = None
+        self._last_time = None
+        self.prediction = None
+        self.counters = {"frames": 0, "skipped_rate": 0, "skipped_similar": 0, "classified": 0}
+
+    def due(self, timestamp):
+        """True when a frame at timestamp (seconds) may be classified under the rate cap."""
+        return self._last_time is None or timestamp - self._last_time >= self.interval
+
+    def process(self, frame, timestamp):
+        """Classify a decoded BGR frame unless it is nearly identical to the last one; returns the smoothed Prediction."""
+        self._last_time = timestamp
+        thumb = thumbnail(frame)
+        if self._last_thumb is not None and np.abs(thumb - self._last_thumb).mean() < self.diff_threshold:
+            self.counters["skipped_similar"] += 1
+            return self.prediction
+        self._last_thumb = thumb
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        logits = self.batcher.predict(self.store.fast_preprocessor()([image]))[0]
+        self.window.append(probabilities(logits, self.store.temperature))
+        self.counters["classified"] += 1
+        # summarize() of log(mean probs) gives the top-k of the averaged distribution
+        mean = torch.stack(list(self.window)).mean(dim=0)
+        self.prediction = summarize(mean.clamp_min(1e-12).log())[0]
+        return self.prediction
+
+    def stats(self):
+        return dict(self.counters, window=len(self.window))
+
+
+def open_source(source):
+    # a bare number is a camera index, anything else a file or stream URL
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not capture.isOpened():
+        raise OSError(f"cannot open video source {source!r}")
+    capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return capture
+
+
+def frames(capture, classifier, realtime=True):
+    """Yield (frame, prediction) for every frame the classifier looked at.
+
+    Video files are read at their own frame rate when realtime is set, so a
+    file behaves like a camera; frames not due under the rate cap are only
+    grabbed, never retrieved.
+    """
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    is_file = capture.get(cv2.CAP_PROP_FRAME_COUNT) > 0
+    start = time.monotonic()
+    index = 0
+    while capture.grab():
+        classifier.counters["frames"] += 1
+        if is_file and fps > 0:
+            timestamp = index / fps
+            if realtime:
+                # don't run ahead of the recording
+                delay = start + timestamp - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        else:
+            timestamp = time.monotonic() - start
+        index += 1
+        if not classifier.due(timestamp):
+            classifier.counters["skipped_rate"] += 1
+            continue
+        ok, frame = capture.retrieve()
+        if not ok:
+            continue
+        yield frame, classifier.process(frame, timestamp)
+
+
+def main(argv=None):
+    from inference_server import get_batcher
+    from model_store import DEFAULT_MODEL_PATH, get_store
+
+    parser = argparse.ArgumentParser(description="Classify a camera or video stream continuously.")
+    parser.add_argument("--source", default="0", help="camera index or video file")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--max-fps", type=float, default=DEFAULT_MAX_FPS, help="classified frames per second")
+    parser.add_argument("--diff", type=float, default=DEFAULT_DIFF_THRESHOLD, help="frame difference gate")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="predictions to smooth over")
+    parser.add_argument("--no-realtime", action="store_true", help="read video files as fast as possible")
+    args = parser.parse_args(argv)
+
+    store = get_store(args.model_path)
+    store.get()  # load before the clock starts, so the report is about the stream only
+    classifier = StreamClassifier(store, get_batcher(store), args.max_fps, args.diff, args.window)
+    capture = open_source(args.source)
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    last = None
+    try:
+        for _, prediction in frames(capture, classifier, realtime=not args.no_realtime):
+            if prediction is not None and prediction.label != last:
+                print(f"{time.monotonic() - wall_start:7.1f}s  {prediction.label} ({prediction.confidence:.0%})")
+                last = prediction.label
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.release()
+    elapsed = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+    print(f"{classifier.stats()} in {elapsed:.1f}s, CPU {cpu:.1f}s ({cpu / max(elapsed, 1e-9):.0%} of one core)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
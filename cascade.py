@@ -0,0 +1,287 @@
+"""Confidence-gated cascade: a cheap first pass, the full model only when unsure.
+
+Stage 1 runs a cheaper configuration: the int8 backend on a lower input
+resolution (DINOv2 interpolates its position embeddings, and a 112 px crop
+has a quarter of the patches of 224 px). When its top-1 probability and its
+margin over the runner-up both clear their thresholds, that answer is used;
+otherwise the image is escalated to the full model.
+
+The thresholds are tuned on labelled validation data so that the cascade
+stays within --max-drop of the full model's accuracy at the lowest
+average CPU cost, and written next to the checkpoint, to
+<model-path>.cascade.json (or SKIN_CASCADE_FILE):
+
+    python cascade.py --tune validation/ --model-path ./dinov2_skin_disease_model
+
+The file stays outside the checkpoint directory on purpose: any file
+written there changes the checkpoint fingerprint, which reloads the model
+in every running app, invalidates the prediction cache and makes
+serve_multi.py rebuild its snapshot.
+
+The app uses the cascade with SKIN_CASCADE=1 through get_cascade(), one
+per process, rebuilt only when the thresholds file changes. Both stages go
+through a MicroBatcher like every other forward pass, and the cheap backend
+is built when the cascade is created, not on the first request.
+Cascade.stats() counts the requests each stage answered and their CPU
+time; the --tune report also gives the accuracy each stage delivered on the
+validation set.
+"""
+import argparse
+import copy
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import torch
+
+from inference_server import get_batcher
+from postprocess import labelled_images
+
+CASCADE_SUFFIX = ".cascade.json"
+DEFAULT_CHEAP_BACKEND = "int8"
+DEFAULT_CHEAP_SIZE = 112
+DEFAULT_MAX_DROP = 0.005
+
+
+def low_res_preprocessor(fast, crop):
+    """Copy of a FastPreprocessor whose resize and crop are scaled so the output is crop px on the short side."""
+    small = copy.copy(fast)
+    factor = crop / min(fast.output_size)
+    scale = lambda value: None if value is None else max(1, round(value * factor))
+    small.shortest_edge = scale(fast.shortest_edge)
+    small.resize_hw = tuple(scale(v) for v in fast.resize_hw)
+    small.crop_hw = tuple(scale(v) for v in fast.crop_hw) if fast.crop_hw else None
+    # its own per-thread buffers, the shapes differ from the full-size ones
+    small._local = threading.local()
+    return small
+
+
+def gate(probs, min_prob, min_margin):
+    """Boolean mask of rows the cheap stage may answer."""
+    top2 = probs.topk(2, dim=-1).values
+    return (top2[:, 0] >= min_prob) & (top2[:, 0] - top2[:, 1] >= min_margin)
+
+
+def thresholds_path(model_path):
+    return os.environ.get("SKIN_CASCADE_FILE") or os.path.normpath(model_path) + CASCADE_SUFFIX
+
+
+def load_thresholds(model_path):
+    path = thresholds_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Cascade:
+    """Runs `cheap` and escalates to `full` when unsure; both are pixel_values -> logits callables.
+
+    They default to calling the backends directly; from_checkpoint() puts
+    them behind the process-wide batchers.
+    """
+
+    def __init__(self, store, full=None, cheap_backend=DEFAULT_CHEAP_BACKEND, cheap_size=DEFAULT_CHEAP_SIZE,
+                 min_prob=0.6, min_margin=0.2, cheap=None):
+        self.store = store
+        self.full = full or (lambda pixel_values: store.backend()(pixel_values))
+        self.cheap = cheap or (lambda pixel_values: store.backend(cheap_backend)(pixel_values))
+        self.cheap_backend = cheap_backend
+        self.cheap_size = cheap_size
+        self.min_prob = min_prob
+        self.min_margin = min_margin
+        self._lock = threading.Lock()
+        self._small = None
+        self.counters = {"cheap_answered": 0, "full_answered": 0, "cheap_cpu_seconds": 0.0, "full_cpu_seconds": 0.0}
+
+    @classmethod
+    def from_checkpoint(cls, store, full=None):
+        """Cascade with the thresholds tuned for store's checkpoint (defaults when none are tuned yet).
+
+        None when tuning found that the cascade costs more than the full model alone.
+        """
+        tuned = load_thresholds(store.path) or {}
+        if not tuned.get("enabled", True):
+            return None
+        kwargs = {k: tuned[k] for k in ("cheap_backend", "cheap_size", "min_prob", "min_margin") if k in tuned}
+        cheap_backend = kwargs.get("cheap_backend", DEFAULT_CHEAP_BACKEND)
+        # one worker thread for the cheap stage, not one forward pass per session thread
+        cheap = get_batcher(store, cheap_backend, replicas="").predict
+        return cls(store, full or get_batcher(store).predict, cheap=cheap, **kwargs)
+
+    def warm(self):
+        """Build the cheap backend (int8 quantizes a copy of the model) and run it once."""
+        self.store.backend(self.cheap_backend)
+        self.cheap(torch.zeros(1, 3, *self._small_preprocessor().output_size))
+
+    def _small_preprocessor(self):
+        fast = self.store.fast_preprocessor()
+        with self._lock:
+            if self._small is None or self._small[0] is not fast:
+                self._small = (fast, low_res_preprocessor(fast, self.cheap_size))
+            return self._small[1]
+
+    def predict(self, image):
+        """(logits, stage name) for one PIL image."""
+        start = time.process_time()
+        pixel_values = self._small_preprocessor()([image])
+        logits = self.cheap(pixel_values)[0]
+        accept = bool(gate(logits.softmax(-1).unsqueeze(0), self.min_prob, self.min_margin)[0])
+        cheap_cpu = time.process_time() - start
+        if accept:
+            self._count("cheap", cheap_cpu)
+            return logits, "cheap"
+        start = time.process_time()
+        logits = self.full(self.store.fast_preprocessor()([image]))[0]
+        self._count("full", cheap_cpu + time.process_time() - start)
+        return logits, "full"
+
+    def _count(self, stage, cpu_seconds):
+        # process CPU time, so concurrent requests inflate each other's share
+        with self._lock:
+            self.counters[f"{stage}_answered"] += 1
+            self.counters[f"{stage}_cpu_seconds"] += cpu_seconds
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        total = counters["cheap_answered"] + counters["full_answered"]
+        cpu = counters["cheap_cpu_seconds"] + counters["full_cpu_seconds"]
+        return dict(counters, min_prob=self.min_prob, min_margin=self.min_margin,
+                    cheap_fraction=counters["cheap_answered"] / total if total else None,
+                    cpu_ms_per_prediction=1000 * cpu / total if total else None)
+
+
+_cascades = {}
+_cascades_lock = threading.Lock()
+
+
+def _file_signature(path):
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return info.st_size, info.st_mtime_ns
+
+
+def get_cascade(store):
+    """Process-wide, warmed Cascade for store (None when tuning disabled it).
+
+    Rebuilt only when the thresholds file changes, so the stage counters
+    cover every request served with the current thresholds.
+    """
+    signature = _file_signature(thresholds_path(store.path))
+    with _cascades_lock:
+        entry = _cascades.get(store.path)
+        if entry is None or entry[0] != signature:
+            cascade = Cascade.from_checkpoint(store)
+            if cascade is not None:
+                cascade.warm()
+            entry = _cascades[store.path] = (signature, cascade)
+        return entry[1]
+
+
+def tune_thresholds(cheap_probs, full_logits, targets, cheap_cost, full_cost, max_drop=DEFAULT_MAX_DROP):
+    """Cheapest (min_prob, min_margin) whose cascade accuracy is within max_drop of the full model.
+
+    Returns a report dict with the thresholds, per-stage answer counts and
+    accuracies and the expected CPU cost per prediction.
+    """
+    targets = torch.as_tensor(targets)
+    cheap_pred = cheap_probs.argmax(-1)
+    full_pred = full_logits.argmax(-1)
+    full_accuracy = (full_pred == targets).float().mean().item()
+    best = None
+    for min_prob in np.linspace(0.0, 1.0, 41):
+        for min_margin in np.linspace(0.0, 1.0, 41):
+            accepted = gate(cheap_probs, float(min_prob), float(min_margin))
+            predicted = torch.where(accepted, cheap_pred, full_pred)
+            accuracy = (predicted == targets).float().mean().item()
+            if accuracy < full_accuracy - max_drop:
+                continue
+            # every request pays for the cheap stage, escalated ones also for the full model
+            cost = cheap_cost + (1 - accepted.float().mean().item()) * full_cost
+            if (best is None or cost < best["cpu_ms_per_prediction"] - 1e-9
+                    or (cost <= best["cpu_ms_per_prediction"] + 1e-9 and accuracy > best["accuracy"])):
+                best = {"min_prob": float(min_prob), "min_margin": float(min_margin),
+                        "accuracy": accuracy, "cpu_ms_per_prediction": cost, "accepted": accepted}
+    accepted = best.pop("accepted")
+    escalated = ~accepted
+    stage_accuracy = lambda mask, pred: (pred[mask] == targets[mask]).float().mean().item() if mask.any() else None
+    # the cheap stage is paid by every request, escalating most of them can cost more than no cascade
+    best.update(enabled=best["cpu_ms_per_prediction"] < full_cost,
+                full_accuracy=full_accuracy, full_cpu_ms_per_prediction=full_cost,
+                cheap_answered=int(accepted.sum()), full_answered=int(escalated.sum()),
+                cheap_accuracy=stage_accuracy(accepted, cheap_pred),
+                full_accuracy_on_escalated=stage_accuracy(escalated, full_pred))
+    return best
+
+
+def _timed_logits(backend, batches):
+    # CPU milliseconds per image of running backend over all batches
+    backend(batches[0])  # warm-up
+    start = time.process_time()
+    logits = torch.cat([backend(pv) for pv in batches]).float()
+    return logits, 1000 * (time.process_time() - start) / len(logits)
+
+
+def main(argv=None):
+    from batch_infer import load_image
+    from model_store import DEFAULT_MODEL_PATH, get_store
+
+    parser = argparse.ArgumentParser(description="Tune and evaluate the cheap-first inference cascade.")
+    parser.add_argument("--tune", required=True, metavar="DIR", help="validation images, one sub-directory per class")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--cheap-backend", default=DEFAULT_CHEAP_BACKEND)
+    parser.add_argument("--cheap-size", type=int, default=DEFAULT_CHEAP_SIZE)
+    parser.add_argument("--max-drop", type=float, default=DEFAULT_MAX_DROP, help="accuracy the cascade may lose")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--output", default=None, help="thresholds file (default: <model-path>.cascade.json)")
+    parser.add_argument("--dry-run", action="store_true", help="report only, do not write the thresholds")
+    args = parser.parse_args(argv)
+
+    pairs = labelled_images(args.tune)
+    if not pairs:
+        parser.error(f"no images under class-named sub-directories of {args.tune}")
+    store = get_store(args.model_path)
+    fast = store.fast_preprocessor()
+    small = low_res_preprocessor(fast, args.cheap_size)
+    full_batches, cheap_batches = [], []
+    for i in range(0, len(pairs), args.batch_size):
+        images = [load_image(path) for path, _ in pairs[i:i + args.batch_size]]
+        full_batches.append(fast(images))
+        cheap_batches.append(small(images))
+    targets = [target for _, target in pairs]
+
+    full_logits, full_cost = _timed_logits(store.backend(), full_batches)
+    cheap_logits, cheap_cost = _timed_logits(store.backend(args.cheap_backend), cheap_batches)
+    report = tune_thresholds(cheap_logits.softmax(-1), full_logits, targets, cheap_cost, full_cost, args.max_drop)
+    # the checkpoint the thresholds were tuned on, for reference
+    report.update(cheap_backend=args.cheap_backend, cheap_size=args.cheap_size, images=len(pairs),
+                  fingerprint=store.fingerprint)
+
+    fmt = lambda v: "n/a" if v is None else f"{v:.2%}"
+    print(f"full model:  accuracy {fmt(report['full_accuracy'])}, {full_cost:.1f} CPU ms/image")
+    print(f"cheap stage ({args.cheap_backend}, {args.cheap_size}px): {cheap_cost:.1f} CPU ms/image")
+    print(f"thresholds:  top-1 >= {report['min_prob']:.3f}, margin >= {report['min_margin']:.3f}")
+    print(f"  cheap answered {report['cheap_answered']}/{len(pairs)}, accuracy {fmt(report['cheap_accuracy'])}")
+    print(f"  full answered  {report['full_answered']}/{len(pairs)}, "
+          f"accuracy {fmt(report['full_accuracy_on_escalated'])}")
+    print(f"cascade:     accuracy {fmt(report['accuracy'])}, {report['cpu_ms_per_prediction']:.1f} CPU ms/image "
+          f"({report['cpu_ms_per_prediction'] / full_cost:.0%} of full)")
+    if not report["enabled"]:
+        print("the cascade does not save CPU on this model, SKIN_CASCADE=1 will run the full model only")
+    if not args.dry_run and math.isfinite(report["cpu_ms_per_prediction"]):
+        path = args.output or thresholds_path(args.model_path)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp, path)
+        print(f"wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
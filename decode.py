@@ -0,0 +1,99 @@
+"""Image decoding that only produces as many pixels as the model needs.
+
+A 12-48 MP photo decodes to 36-150 MB of RGB, which resize() then shrinks
+to a few hundred pixels on the short side. For JPEGs, PIL's draft mode lets
+libjpeg scale by 1/2, 1/4 or 1/8 in the DCT domain while decoding, so the
+full-size bitmap never exists. decode() asks for the largest reduction that
+still leaves the image at least as large as the resize step's output (times
+DRAFT_MARGIN), so the final bicubic resize always downsamples.
+
+It also applies the EXIF orientation (phones store most photos rotated) and
+refuses images whose decoded pixel count exceeds max_pixels before any pixel
+data is read, which stops decompression bombs. Other formats (PNG, WebP)
+are decoded at full size but still checked and oriented.
+
+    python decode.py photo.jpg --model-path ./dinov2_skin_disease_model
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+from PIL import Image, ImageOps
+
+DEFAULT_MAX_PIXELS = int(os.environ.get("SKIN_MAX_IMAGE_PIXELS", 100_000_000))
+# decoded size is kept at >= DRAFT_MARGIN x the resize target on each side
+DRAFT_MARGIN = float(os.environ.get("SKIN_DRAFT_MARGIN", 1.0))
+
+
+class ImageTooLarge(ValueError):
+    """The image would decode to more than max_pixels pixels."""
+
+
+def _min_size(target, width, height):
+    if target is None:
+        return None
+    if callable(target):
+        target = target(width, height)
+    # the transpose only swaps the sides, so the raw orientation is fine for the scale factor
+    return tuple(int(round(side * DRAFT_MARGIN)) for side in target)
+
+
+def decode(source, target=None, max_pixels=DEFAULT_MAX_PIXELS, info=None):
+    """Open a path, bytes or file object as an upright RGB PIL image.
+
+    target is the size the image will be resized to, either (width, height)
+    or a callable taking the stored (width, height), e.g.
+    FastPreprocessor.decode_size; JPEGs are then decoded at reduced
+    resolution. When info is a dict it receives the original and decoded
+    sizes, the decode time and the bytes of RGB saved by the draft.
+    """
+    start = time.perf_counter()
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as exc:
+        # PIL's own guard on the stored size (2 x Image.MAX_IMAGE_PIXELS) fires first
+        raise ImageTooLarge(str(exc)) from exc
+    original = image.size
+    min_size = _min_size(target, *original)
+    if min_size is not None and image.format == "JPEG":
+        # only sets the libjpeg scale, nothing is decoded yet
+        image.draft("RGB", min_size)
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(f"{original[0]}x{original[1]} image decodes to {width * height} pixels, "
+                            f"more than the limit of {max_pixels}")
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("RGB")
+    if info is not None:
+        full_bytes = original[0] * original[1] * 3
+        info.update(original_size=original, decoded_size=image.size, draft=(width, height) != original,
+                    decode_seconds=time.perf_counter() - start,
+                    saved_bytes=full_bytes - image.size[0] * image.size[1] * 3)
+    return image
+
+
+def main(argv=None):
+    from model_store import DEFAULT_MODEL_PATH, get_store
+
+    parser = argparse.ArgumentParser(description="Compare full and reduced-resolution decoding of images.")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    fast = get_store(args.model_path).fast_preprocessor()
+    for path in args.images:
+        full, reduced = {}, {}
+        decode(path, info=full)
+        decode(path, fast.decode_size, info=reduced)
+        print(f"{path}: {full['original_size'][0]}x{full['original_size'][1]} -> "
+              f"{reduced['decoded_size'][0]}x{reduced['decoded_size'][1]}, "
+              f"{1000 * full['decode_seconds']:.1f} ms -> {1000 * reduced['decode_seconds']:.1f} ms, "
+              f"{reduced['saved_bytes'] / 2 ** 20:.1f} MB saved", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""DINOv2 embeddings and a memory-mapped nearest-neighbour index of labelled cases.
+
+The classification head of the checkpoint sees concat(CLS token, mean patch
+token) of the backbone output; pooled_features() returns exactly that
+vector together with the logits, so one forward pass gives both. The app
+sends that pass through its own MicroBatcher (predict_with_features), so
+concurrent sessions share forward passes for embeddings too.
+
+CaseIndex keeps the vectors L2-normalised as float16 rows in a single
+memory-mapped file and searches them with an inverted-file (IVF) index:
+k-means centroids (float32, small) plus one append-only id list per
+centroid. A query only touches the rows of the nprobe closest lists, so the
+matrix never has to fit in RAM. Adding cases appends rows and ids without
+rebuilding; the centroids are trained once the index has enough vectors
+(until then search is an exact chunked scan). Readers (the app) only look
+at the first state["count"] rows, so they can open the index while the add
+CLI is writing it; leftovers of an interrupted add() are dropped by the
+next writer, never by a reader.
+
+    python embeddings.py add /data/labelled --index ./case_index
+    python embeddings.py search photo.jpg --index ./case_index -k 5
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import torch
+
+DEFAULT_NLIST = 256
+# vectors per centroid needed before the IVF centroids are trained
+TRAIN_FACTOR = 40
+SCAN_CHUNK = 65536
+
+
+def pooled_features(model, pixel_values):
+    """(logits, embeddings) for a DINOv2 image classifier in a single forward pass."""
+    if not hasattr(model, "dinov2"):
+        raise ValueError(f"{type(model).__name__} has no DINOv2 backbone to take embeddings from")
+    with torch.no_grad():
+        sequence = model.dinov2(pixel_values=pixel_values)[0]
+        features = torch.cat([sequence[:, 0], sequence[:, 1:].mean(dim=1)], dim=1)
+        logits = model.classifier(features)
+    return logits, features
+
+
+class FeatureBackend:
+    """Backend-style callable returning concat(logits, embeddings) rows, so a MicroBatcher can batch it.
+
+    Always the fp32 eager model whatever SKIN_BACKEND says: the case index
+    holds embeddings of that model, and queries have to come from the same one.
+    """
+
+    name = "features"
+
+    def __init__(self, store):
+        self.store = store
+
+    def __call__(self, pixel_values):
+        _, model = self.store.get()
+        logits, features = pooled_features(model, pixel_values)
+        return torch.cat([logits, features], dim=1)
+
+
+_feature_batchers = {}
+_feature_batchers_lock = threading.Lock()
+
+
+def get_feature_batcher(store):
+    """Process-wide MicroBatcher in front of FeatureBackend(store)."""
+    from inference_server import MicroBatcher
+
+    with _feature_batchers_lock:
+        batcher = _feature_batchers.get(store.path)
+        if batcher is None:
+            backend = FeatureBackend(store)
+            batcher = _feature_batchers[store.path] = MicroBatcher(lambda: backend, name="feature-batcher")
+        return batcher
+
+
+def predict_with_features(store, pixel_values):
+    """(logits, embeddings) for pixel_values, batched with other sessions' requests."""
+    output = get_feature_batcher(store).predict(pixel_values)
+    num_classes = store.get()[1].config.num_labels
+    return output[:, :num_classes], output[:, num_classes:]
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def kmeans(data, k, iterations=10, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        for c in range(k):
+            members = data[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                centroids[c] = data[rng.integers(len(data))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class CaseIndex:
+    """Append-only float16 embedding matrix with an IVF index and per-row metadata."""
+
+    def __init__(self, root, dim=None, nlist=DEFAULT_NLIST):
+        self.root = root
+        os.makedirs(os.path.join(root, "lists"), exist_ok=True)
+        self._state_path = os.path.join(root, "index.json")
+        self._vectors_path = os.path.join(root, "vectors.f16")
+        self._meta_path = os.path.join(root, "meta.jsonl")
+        self._offsets_path = os.path.join(root, "meta.offsets")
+        self._centroids_path = os.path.join(root, "centroids.npy")
+        self._state_mtime = None
+        self._repaired = False
+        if os.path.exists(self._state_path):
+            self._load_state()
+        else:
+            if dim is None:
+                raise ValueError(f"{root} has no index yet, pass dim to create one")
+            self.state = {"dim": dim, "count": 0, "nlist": nlist, "trained": False}
+            self._save_state()
+        self.centroids = np.load(self._centroids_path) if self.state["trained"] else None
+
+    def refresh(self):
+        """Pick up rows added by another process (e.g. the add CLI) since this index was opened."""
+        if os.stat(self._state_path).st_mtime_ns != self._state_mtime:
+            self._load_state()
+            self.centroids = np.load(self._centroids_path) if self.state["trained"] else None
+
+    @property
+    def dim(self):
+        return self.state["dim"]
+
+    def __len__(self):
+        return self.state["count"]
+
+    def vectors(self):
+        """Read-only memmap of all stored rows (float16, normalised)."""
+        if not len(self):
+            return np.zeros((0, self.dim), dtype=np.float16)
+        return np.memmap(self._vectors_path, dtype=np.float16, mode="r", shape=(len(self), self.dim))
+
+    def metadata(self, row):
+        # meta.offsets holds the byte offset of every row's line, so lookups stay O(1) on disk
+        offset = int(np.fromfile(self._offsets_path, dtype=np.int64, count=1, offset=row * 8)[0])
+        with open(self._meta_path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def iter_metadata(self):
+        with open(self._meta_path, encoding="utf-8") as f:
+            for _, line in zip(range(len(self)), f):
+                yield json.loads(line)
+
+    def add(self, vectors, metas):
+        """Append vectors with one metadata dict each (e.g. {"path": ..., "label": ...})."""
+        vectors = _normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+        if not self._repaired:
+            self._repair()
+            self._repaired = True
+        start = len(self)
+        with open(self._vectors_path, "ab") as f:
+            f.write(vectors.astype(np.float16).tobytes())
+        offsets = []
+        with open(self._meta_path, "ab") as f:
+            for meta in metas:
+                offsets.append(f.tell())
+                f.write((json.dumps(meta, ensure_ascii=False) + "\n").encode("utf-8"))
+        with open(self._offsets_path, "ab") as f:
+            f.write(np.asarray(offsets, dtype=np.int64).tobytes())
+        if self.state["trained"]:
+            self._append_to_lists(vectors, np.arange(start, start + len(vectors)))
+        self.state["count"] = start + len(vectors)
+        self._save_state()
+        if not self.state["trained"] and len(self) >= self.state["nlist"] * TRAIN_FACTOR:
+            self.train()
+
+    def train(self, sample_size=None):
+        """(Re)build the IVF centroids from a sample and reassign every row."""
+        nlist = min(self.state["nlist"], len(self))
+        data = self.vectors()
+        sample_size = min(len(self), sample_size or nlist * 256)
+        rows = np.sort(np.random.default_rng(0).choice(len(self), size=sample_size, replace=False))
+        self.centroids = kmeans(np.asarray(data[rows], dtype=np.float32), nlist)
+        np.save(self._centroids_path, self.centroids)
+        for name in os.listdir(os.path.join(self.root, "lists")):
+            os.remove(os.path.join(self.root, "lists", name))
+        for offset in range(0, len(self), SCAN_CHUNK):
+            chunk = np.asarray(data[offset:offset + SCAN_CHUNK], dtype=np.float32)
+            self._append_to_lists(chunk, np.arange(offset, offset + len(chunk)))
+        self.state["trained"] = True
+        self.state["nlist"] = nlist
+        self._save_state()
+
+    def search(self, query, k=5, nprobe=8):
+        """[(row, similarity, metadata)] of the k most similar stored cases."""
+        if not len(self):
+            return []
+        query = _normalize(np.asarray(query).reshape(1, -1))[0]
+        data = self.vectors()
+        if self.centroids is None:
+            candidates = None
+            scores = np.concatenate([np.asarray(data[o:o + SCAN_CHUNK], dtype=np.float32) @ query
+                                     for o in range(0, len(self), SCAN_CHUNK)])
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            candidates = np.concatenate([self._list_ids(c) for c in probe])
+            candidates = candidates[candidates < len(self)]
+            if not len(candidates):
+                return []
+            candidates = np.unique(candidates)
+            scores = np.asarray(data[candidates], dtype=np.float32) @ query
+        top = np.argsort(-scores)[:k]
+        rows = top if candidates is None else candidates[top]
+        return [(int(row), float(scores[i]), self.metadata(int(row))) for i, row in zip(top, rows)]
+
+    def _list_path(self, centroid):
+        return os.path.join(self.root, "lists", f"{centroid:05d}.ids")
+
+    def _list_ids(self, centroid):
+        path = self._list_path(centroid)
+        return np.fromfile(path, dtype=np.int64) if os.path.exists(path) else np.zeros(0, dtype=np.int64)
+
+    def _append_to_lists(self, vectors, ids):
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        for centroid in np.unique(assign):
+            with open(self._list_path(int(centroid)), "ab") as f:
+                f.write(ids[assign == centroid].astype(np.int64).tobytes())
+
+    def _load_state(self):
+        self._state_mtime = os.stat(self._state_path).st_mtime_ns
+        with open(self._state_path, encoding="utf-8") as f:
+            self.state = json.load(f)
+
+    def _save_state(self):
+        tmp = self._state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self._state_path)
+        self._state_mtime = os.stat(self._state_path).st_mtime_ns
+
+    def _repair(self):
+        # an interrupted add() can leave rows past state["count"]; drop them before appending.
+        # Only ever called by a writer: to a reader they may be rows another process is adding
+        row_bytes = self.dim * 2
+        if os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > len(self) * row_bytes:
+            with open(self._vectors_path, "rb+") as f:
+                f.truncate(len(self) * row_bytes)
+        if os.path.exists(self._offsets_path) and os.path.getsize(self._offsets_path) > len(self) * 8:
+            end = int(np.fromfile(self._offsets_path, dtype=np.int64, count=1, offset=len(self) * 8)[0])
+            with open(self._meta_path, "rb+") as f:
+                f.truncate(end)
+            with open(self._offsets_path, "rb+") as f:
+                f.truncate(len(self) * 8)
+
+
+_case_index = None
+
+
+def get_case_index():
+    """Process-wide CaseIndex at SKIN_CASE_INDEX, or None when that is unset or not built yet."""
+    global _case_index
+    root = os.environ.get("SKIN_CASE_INDEX")
+    if not root or not os.path.exists(os.path.join(root, "index.json")):
+        return None
+    if _case_index is None or _case_index.root != root:
+        _case_index = CaseIndex(root)
+    _case_index.refresh()
+    return _case_index
+
+
+def embed_paths(store, paths, batch_size=32):
+    """Yield (paths, embeddings as float32 numpy) per batch of readable images."""
+    from batch_infer import load_image
+    from pipeline import prefetch_batches
+
+    _, model = store.get()
+    fast = store.fast_preprocessor()
+    for ok_paths, arrays, errors in prefetch_batches(paths, lambda p: fast.prepare(load_image(p, fast.decode_size)), batch_size):
+        for path, exc in errors:
+            print(f"skipping {path}: {exc}", file=sys.stderr)
+        if arrays:
+            _, features = pooled_features(model, fast.to_tensor(arrays))
+            yield ok_paths, features.numpy()
+
+
+def main(argv=None):
+    from batch_infer import find_images, load_image
+    from model_store import DEFAULT_MODEL_PATH, get_store
+
+    parser = argparse.ArgumentParser(description="Build and query the similar-case index.")
+    parser.add_argument("command", choices=("add", "search", "train"))
+    parser.add_argument("target", nargs="?", help="image directory for add, image file for search")
+    parser.add_argument("--index", required=True, help="index directory")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--nlist", type=int, default=DEFAULT_NLIST)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    store = get_store(args.model_path)
+    if args.command == "add":
+        # the label of a case is the name of the directory it sits in
+        seen = set()
+        if os.path.exists(os.path.join(args.index, "index.json")):
+            index = CaseIndex(args.index)
+            seen = {meta["path"] for meta in index.iter_metadata()}
+        else:
+            index = None
+        paths = [p for p in find_images(args.target) if os.path.abspath(p) not in seen]
+        for batch_paths, features in embed_paths(store, paths, args.batch_size):
+            if index is None:
+                index = CaseIndex(args.index, dim=features.shape[1], nlist=args.nlist)
+            index.add(features, [{"path": os.path.abspath(p), "label": os.path.basename(os.path.dirname(p))}
+                                 for p in batch_paths])
+        print(f"added {len(paths)} images, index holds {len(index) if index else 0}", file=sys.stderr)
+    elif args.command == "train":
+        CaseIndex(args.index).train()
+    else:
+        fast, (_, model) = store.fast_preprocessor(), store.get()
+        _, features = pooled_features(model, fast([load_image(args.target)]))
+        for row, score, meta in CaseIndex(args.index).search(features[0].numpy(), k=args.k):
+            print(f"{score:.3f}  {meta.get('label', '')}  {meta.get('path', '')}")
+
+
+if __name__ == "__main__":
+    main()
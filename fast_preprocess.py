@@ -0,0 +1,181 @@
+"""Batched preprocessing equivalent to the checkpoint's AutoImageProcessor.
+
+The Hugging Face processor rescales and normalizes every image separately
+and builds the batch tensor at the end. Here each image is only resized and
+center-cropped as uint8 (cheap, can run in worker threads), and the whole
+batch is then converted in one pass: the uint8 crops are copied into a
+per-thread staging buffer and rescale+normalize is folded into a single
+multiply-add on the float output tensor.
+
+    python fast_preprocess.py --check imgs/ --model-path ./dinov2_skin_disease_model
+"""
+import argparse
+import threading
+
+import numpy as np
+import torch
+from PIL import Image
+
+# maximum absolute difference to the Hugging Face processor output we accept
+DEFAULT_TOLERANCE = 1e-4
+
+
+def _size_get(size, key):
+    if size is None:
+        return None
+    return size.get(key) if hasattr(size, "get") else getattr(size, key, None)
+
+
+class FastPreprocessor:
+    """Reproduces resize -> center crop -> rescale -> normalize from a processor config.
+
+    to_tensor() and __call__ return a new tensor the caller owns, so it can be
+    handed to another thread (the MicroBatcher) or held across an await. A
+    caller that is done with every batch before it builds the next one can
+    pass out= to have a preallocated tensor filled instead.
+    """
+
+    def __init__(self, image_processor):
+        p = image_processor
+        self.do_resize = getattr(p, "do_resize", True)
+        self.resample = int(getattr(p, "resample", Image.BICUBIC))
+        self.shortest_edge = _size_get(p.size, "shortest_edge")
+        self.resize_hw = (_size_get(p.size, "height"), _size_get(p.size, "width"))
+        if self.do_resize and self.shortest_edge is None and None in self.resize_hw:
+            raise ValueError(f"unsupported resize config: {p.size}")
+        if _size_get(p.size, "longest_edge"):
+            raise ValueError("longest_edge resizing is not supported by the fast path")
+
+        self.do_center_crop = getattr(p, "do_center_crop", False)
+        crop = getattr(p, "crop_size", None)
+        self.crop_hw = (_size_get(crop, "height"), _size_get(crop, "width")) if self.do_center_crop else None
+
+        rescale = p.rescale_factor if getattr(p, "do_rescale", True) else 1.0
+        if getattr(p, "do_normalize", True):
+            mean = np.asarray(p.image_mean, dtype=np.float64)
+            std = np.asarray(p.image_std, dtype=np.float64)
+        else:
+            mean, std = np.zeros(3), np.ones(3)
+        # (x * rescale - mean) / std == x * scale + shift
+        self.scale = torch.tensor(rescale / std, dtype=torch.float32).view(1, 3, 1, 1)
+        self.shift = torch.tensor(-mean / std, dtype=torch.float32).view(1, 3, 1, 1)
+
+        self._local = threading.local()
+
+    @classmethod
+    def from_pretrained(cls, path):
+        from transformers import AutoImageProcessor
+        return cls(AutoImageProcessor.from_pretrained(path))
+
+    @property
+    def output_size(self):
+        if self.crop_hw:
+            return self.crop_hw
+        if self.shortest_edge is None:
+            return self.resize_hw
+        raise ValueError("output size depends on the input aspect ratio without a center crop")
+
+    def _resize_size(self, width, height):
+        # same rule as transformers' get_resize_output_image_size(default_to_square=False)
+        if self.shortest_edge is None:
+            return self.resize_hw[1], self.resize_hw[0]
+        short, long = (width, height) if width <= height else (height, width)
+        new_short, new_long = self.shortest_edge, int(self.shortest_edge * long / short)
+        return (new_short, new_long) if width <= height else (new_long, new_short)
+
+    def decode_size(self, width, height):
+        """Smallest decoded (width, height) that resize() still shrinks, for decode.decode(target=...)."""
+        return self._resize_size(width, height) if self.do_resize else (width, height)
+
+    def resize(self, image):
+        """The resize step alone, as an RGB PIL image."""
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if self.do_resize:
+            size = self._resize_size(*image.size)
+            if size != image.size:
+                image = image.resize(size, resample=self.resample)
+        return image
+
+    def prepare(self, image):
+        """Resize and center-crop one PIL image, returning an HxWx3 uint8 array."""
+        image = self.resize(image)
+        if self.crop_hw:
+            crop_h, crop_w = self.crop_hw
+            width, height = image.size
+            if width < crop_w or height < crop_h:
+                # transformers pads with zeros when the crop is larger than the image
+                canvas = Image.new("RGB", (max(width, crop_w), max(height, crop_h)))
+                canvas.paste(image, ((canvas.width - width) // 2, (canvas.height - height) // 2))
+                image, width, height = canvas, canvas.width, canvas.height
+            top, left = (height - crop_h) // 2, (width - crop_w) // 2
+            image = image.crop((left, top, left + crop_w, top + crop_h))
+        return np.asarray(image)
+
+    def _staging(self, n, height, width):
+        # uint8 staging buffer, only used within a single to_tensor() call on this thread
+        local = self._local
+        buf = getattr(local, "uint8", None)
+        if buf is None or buf.shape[0] < n or buf.shape[1:3] != (height, width):
+            buf = local.uint8 = np.empty((n, height, width, 3), dtype=np.uint8)
+        return buf[:n]
+
+    def to_tensor(self, arrays, out=None):
+        """Stack prepared uint8 crops into a normalized (N, 3, H, W) float tensor.
+
+        out, if given, is a float32 tensor with at least N rows of the same
+        (3, H, W) shape; its first N rows are overwritten and returned.
+        """
+        height, width = arrays[0].shape[:2]
+        if out is None:
+            out = torch.empty((len(arrays), 3, height, width), dtype=torch.float32)
+        elif out.shape[0] < len(arrays) or tuple(out.shape[1:]) != (3, height, width):
+            raise ValueError(f"out has shape {tuple(out.shape)}, need ({len(arrays)}, 3, {height}, {width})")
+        else:
+            out = out[:len(arrays)]
+        buf = self._staging(len(arrays), height, width)
+        for i, arr in enumerate(arrays):
+            buf[i] = arr
+        out.copy_(torch.from_numpy(buf).permute(0, 3, 1, 2))
+        out.mul_(self.scale).add_(self.shift)
+        return out
+
+    def __call__(self, images, out=None):
+        """Preprocess a list of PIL images into pixel_values."""
+        return self.to_tensor([self.prepare(image) for image in images], out=out)
+
+
+def check(image_processor, images, tolerance=DEFAULT_TOLERANCE):
+    """Compare the fast path with image_processor on images; returns the max abs difference."""
+    fast = FastPreprocessor(image_processor)
+    worst = 0.0
+    for image in images:
+        expected = image_processor(image, return_tensors="pt")["pixel_values"]
+        actual = fast([image])
+        if expected.shape != actual.shape:
+            raise AssertionError(f"shape mismatch: {tuple(actual.shape)} vs {tuple(expected.shape)}")
+        worst = max(worst, (expected - actual).abs().max().item())
+    if worst > tolerance:
+        raise AssertionError(f"fast preprocessing differs by {worst:.2e} (tolerance {tolerance:.0e})")
+    return worst
+
+
+def main(argv=None):
+    from model_store import DEFAULT_MODEL_PATH
+    from batch_infer import find_images, load_image
+    from transformers import AutoImageProcessor
+
+    parser = argparse.ArgumentParser(description="Check the fast preprocessing path against AutoImageProcessor.")
+    parser.add_argument("--check", required=True, metavar="DIR", help="directory of images to compare on")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    image_processor = AutoImageProcessor.from_pretrained(args.model_path)
+    images = [load_image(path) for path in find_images(args.check)]
+    worst = check(image_processor, images, args.tolerance)
+    print(f"{len(images)} images, max abs difference {worst:.2e}")
+
+
+if __name__ == "__main__":
+    main()
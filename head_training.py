@@ -0,0 +1,299 @@
+"""Retrain or recalibrate only the classification head from cached backbone features.
+
+The DINOv2 backbone stays frozen, so its output for an image never changes.
+FeatureCache stores that output (the concat(CLS, mean patch) vector the head
+sees, see embeddings.pooled_features) once per image, keyed by the SHA-256
+of the file contents: adding cases only runs the backbone on the new files,
+an edited image gets a new hash and is re-featurized, and moving a file to
+another class directory (a label fix) costs nothing. Features are float16
+rows in fixed-size .npy chunks plus an append-only index, and the whole
+cache is dropped when the backbone weights or the preprocessing change.
+
+    python head_training.py train /data/labelled --val /data/validation
+    python head_training.py calibrate /data/validation
+
+Both directories have one sub-directory per class name (see
+postprocess.labelled_images). train starts from the current head, keeps
+the epoch with the best validation loss, fits the softmax temperature on the
+validation set and writes config.json, model.safetensors and
+calibration.json back into --output (default: the model directory), one
+file at a time with os.replace, so a running app picks up the new head on
+its next fingerprint check. An existing snapshot of that directory is
+rebuilt as well.
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import torch
+
+from disease_info import class_names
+from postprocess import CALIBRATION_FILE, calibration_report, fit_temperature, labelled_images
+
+DEFAULT_CACHE_DIR = os.environ.get("SKIN_FEATURE_CACHE", "./.feature_cache")
+CHUNK_ROWS = 1024
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def backbone_fingerprint(model, fast):
+    """Identity of everything that determines the features: backbone weights and preprocessing."""
+    digest = hashlib.sha1()
+    for name, tensor in sorted(model.dinov2.state_dict().items()):
+        digest.update(name.encode("utf-8"))
+        digest.update(tensor.detach().contiguous().numpy().tobytes())
+    settings = [fast.do_resize, fast.resample, fast.shortest_edge, fast.resize_hw, fast.crop_hw,
+                fast.scale.flatten().tolist(), fast.shift.flatten().tolist()]
+    digest.update(json.dumps(settings).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """Append-only float16 feature rows in .npy chunks, looked up by image content hash."""
+
+    def __init__(self, root, fingerprint, dim):
+        self.root = root
+        self._meta_path = os.path.join(root, "cache.json")
+        self._index_path = os.path.join(root, "index.jsonl")
+        meta = None
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta is None or meta["fingerprint"] != fingerprint or meta["dim"] != dim:
+            # different backbone or preprocessing, every cached feature is stale
+            shutil.rmtree(root, ignore_errors=True)
+            os.makedirs(root)
+            meta = {"fingerprint": fingerprint, "dim": dim, "chunks": 0}
+            self._save_meta(meta)
+        self.meta = meta
+        self.rows = {}  # hash -> (chunk, row)
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "rb+") as f:
+                end = 0
+                for line in f:
+                    try:
+                        entry = json.loads(line) if line.endswith(b"\n") else None
+                    except ValueError:
+                        entry = None
+                    if entry is None:
+                        # torn last line from an interrupted run: cut it off, or the next
+                        # add() would append every later entry behind it
+                        f.truncate(end)
+                        break
+                    self.rows[entry["hash"]] = (entry["chunk"], entry["row"])
+                    end += len(line)
+        self._chunks = {}
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _chunk_path(self, chunk):
+        return os.path.join(self.root, f"features-{chunk:05d}.npy")
+
+    def _save_meta(self, meta):
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path)
+
+    def add(self, keys, features):
+        """Store (N, dim) features for N content hashes, in new chunks of at most CHUNK_ROWS rows."""
+        features = np.asarray(features, dtype=np.float16)
+        for offset in range(0, len(keys), CHUNK_ROWS):
+            chunk = self.meta["chunks"]
+            rows = features[offset:offset + CHUNK_ROWS]
+            # the chunk is complete on disk before the index refers to it
+            tmp = self._chunk_path(chunk) + ".tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, rows)
+            os.replace(tmp, self._chunk_path(chunk))
+            self.meta["chunks"] = chunk + 1
+            self._save_meta(self.meta)
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                for row, key in enumerate(keys[offset:offset + CHUNK_ROWS]):
+                    f.write(json.dumps({"hash": key, "chunk": chunk, "row": row}) + "\n")
+                    self.rows[key] = (chunk, row)
+
+    def get(self, keys):
+        """(N, dim) float32 features for cached content hashes."""
+        out = np.empty((len(keys), self.meta["dim"]), dtype=np.float32)
+        for i, key in enumerate(keys):
+            chunk, row = self.rows[key]
+            if chunk not in self._chunks:
+                self._chunks[chunk] = np.load(self._chunk_path(chunk), mmap_mode="r")
+            out[i] = self._chunks[chunk][row]
+        return out
+
+
+def featurize(store, paths, cache_dir=DEFAULT_CACHE_DIR, batch_size=32):
+    """(N, dim) features for paths, running the backbone only on images the cache has not seen."""
+    from embeddings import embed_paths
+
+    _, model = store.get()
+    fast = store.fast_preprocessor()
+    dim = model.classifier.in_features
+    cache = FeatureCache(cache_dir, backbone_fingerprint(model, fast), dim)
+    keys = [file_hash(path) for path in paths]
+    todo, seen = [], set()
+    for path, key in zip(paths, keys):
+        if key not in cache and key not in seen:
+            todo.append(path)
+            seen.add(key)
+    print(f"{len(paths)} images, {len(paths) - len(todo)} cached, {len(todo)} to featurize", file=sys.stderr)
+    path_keys = dict(zip(paths, keys))
+    pending_keys, pending = [], []
+    for ok_paths, features in embed_paths(store, todo, batch_size):
+        pending_keys += [path_keys[p] for p in ok_paths]
+        pending.append(features)
+        # write full chunks as they fill up, so an interrupted run keeps most of its work
+        if len(pending_keys) >= CHUNK_ROWS:
+            cache.add(pending_keys, np.concatenate(pending))
+            pending_keys, pending = [], []
+    if pending_keys:
+        cache.add(pending_keys, np.concatenate(pending))
+    # unreadable images were skipped by embed_paths
+    keep = [i for i, key in enumerate(keys) if key in cache]
+    return cache.get([keys[i] for i in keep]), keep
+
+
+def train_head(features, targets, weight, bias, val=None, epochs=200, lr=1e-3, weight_decay=1e-4,
+               batch_size=256, seed=0):
+    """Fit a linear head on features, starting from (weight, bias); returns the best (weight, bias)."""
+    torch.manual_seed(seed)
+    x, y = torch.as_tensor(features).float(), torch.as_tensor(targets).long()
+    head = torch.nn.Linear(weight.shape[1], weight.shape[0])
+    with torch.no_grad():
+        head.weight.copy_(weight)
+        head.bias.copy_(bias)
+    optimizer = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=weight_decay)
+    loss_fn = torch.nn.functional.cross_entropy
+
+    def val_loss():
+        with torch.no_grad():
+            vx, vy = val if val is not None else (x, y)
+            return loss_fn(head(torch.as_tensor(vx).float()), torch.as_tensor(vy).long()).item()
+
+    best, best_state = val_loss(), copy.deepcopy(head.state_dict())
+    for epoch in range(epochs):
+        for idx in torch.randperm(len(x)).split(batch_size):
+            optimizer.zero_grad()
+            loss_fn(head(x[idx]), y[idx]).backward()
+            optimizer.step()
+        current = val_loss()
+        if current < best:
+            best, best_state = current, copy.deepcopy(head.state_dict())
+    return best_state["weight"], best_state["bias"]
+
+
+def write_checkpoint(model, processor, weight, bias, output, temperature=None, images=None):
+    """Write the model with a new head as a from_pretrained checkpoint, replacing files one by one."""
+    state = dict(model.state_dict(), **{"classifier.weight": weight.contiguous(), "classifier.bias": bias.contiguous()})
+    config = copy.deepcopy(model.config)
+    config.id2label = dict(enumerate(class_names))
+    config.label2id = {name: i for i, name in enumerate(class_names)}
+    tmp = os.path.normpath(output) + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    model.save_pretrained(tmp, state_dict=state)
+    config.save_pretrained(tmp)
+    if processor is not None and not os.path.exists(os.path.join(output, "preprocessor_config.json")):
+        processor.save_pretrained(tmp)
+    if temperature is not None:
+        with open(os.path.join(tmp, CALIBRATION_FILE), "w", encoding="utf-8") as f:
+            json.dump({"temperature": temperature, "images": images}, f, indent=2)
+    os.makedirs(output, exist_ok=True)
+    # weights before config, so a reader never sees the new config with the old weights
+    names = sorted(os.listdir(tmp), key=lambda name: name == "config.json")
+    for name in names:
+        os.replace(os.path.join(tmp, name), os.path.join(output, name))
+    os.rmdir(tmp)
+
+
+def _split(pairs, fraction, seed=0):
+    order = np.random.default_rng(seed).permutation(len(pairs))
+    n_val = int(len(pairs) * fraction)
+    return [pairs[i] for i in order[n_val:]], [pairs[i] for i in order[:n_val]]
+
+
+def main(argv=None):
+    from model_store import DEFAULT_MODEL_PATH, get_store
+    from snapshot import create_snapshot, default_snapshot_path
+
+    parser = argparse.ArgumentParser(description="Retrain or recalibrate the classification head from cached features.")
+    parser.add_argument("command", choices=("train", "calibrate"))
+    parser.add_argument("data", help="labelled images, one sub-directory per class name")
+    parser.add_argument("--val", default=None, help="validation directory (default: hold out --val-fraction of data)")
+    parser.add_argument("--val-fraction", type=float, default=0.1)
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--output", default=None, help="checkpoint directory to write (default: --model-path)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--weight-decay", type=float, default=1e-4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args(argv)
+    output = args.output or args.model_path
+
+    pairs = labelled_images(args.data)
+    if not pairs:
+        parser.error(f"no images under class-named sub-directories of {args.data}")
+    if args.command == "calibrate":
+        train_pairs, val_pairs = [], pairs
+    elif args.val:
+        train_pairs, val_pairs = pairs, labelled_images(args.val)
+    else:
+        train_pairs, val_pairs = _split(pairs, args.val_fraction)
+    if not val_pairs:
+        parser.error("no validation images")
+
+    store = get_store(args.model_path)
+    processor, model = store.get()
+    start = time.perf_counter()
+    all_pairs = train_pairs + val_pairs
+    features, keep = featurize(store, [p for p, _ in all_pairs], args.cache, args.batch_size)
+    targets = np.asarray([all_pairs[i][1] for i in keep])
+    is_val = np.asarray([i >= len(train_pairs) for i in keep])
+    print(f"features ready in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    weight, bias = model.classifier.weight.detach().clone(), model.classifier.bias.detach().clone()
+    if weight.shape[0] != len(class_names):
+        # the checkpoint was trained on a different class list, start the head from scratch
+        weight, bias = torch.zeros(len(class_names), weight.shape[1]), torch.zeros(len(class_names))
+    val_x, val_y = features[is_val], targets[is_val]
+    before = calibration_report(torch.from_numpy(val_x) @ weight.T + bias, val_y)
+    print("current head: nll={nll:.4f} accuracy={accuracy:.2%}".format(**before), file=sys.stderr)
+    if args.command == "train":
+        start = time.perf_counter()
+        weight, bias = train_head(features[~is_val], targets[~is_val], weight, bias, val=(val_x, val_y),
+                                  epochs=args.epochs, lr=args.lr, weight_decay=args.weight_decay)
+        print(f"trained on {int((~is_val).sum())} images in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    logits = torch.from_numpy(val_x) @ weight.T + bias
+    temperature = fit_temperature(logits, val_y)
+    after = calibration_report(logits, val_y, temperature)
+    print("new head: T={temperature:.3f} nll={nll:.4f} ece={ece:.4f} accuracy={accuracy:.2%}".format(**after),
+          file=sys.stderr)
+
+    write_checkpoint(model, processor, weight, bias, output, temperature, images=len(val_y))
+    print(f"wrote {output}", file=sys.stderr)
+    if os.path.exists(default_snapshot_path(output)):
+        create_snapshot(output)
+        print(f"rebuilt {default_snapshot_path(output)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Micro-batching front for the single shared model.
+
+Concurrent Streamlit sessions (and the batch/API tools) submit pixel_values
+here instead of calling the model themselves. One worker thread drains the
+queue, coalesces whatever arrived within max_wait_ms (up to max_batch_size
+images) into a single forward pass and hands each caller its slice of the
+logits back through a Future.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import torch
+
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get("SKIN_MAX_BATCH_SIZE", 16))
+DEFAULT_MAX_WAIT_MS = float(os.environ.get("SKIN_MAX_WAIT_MS", 5.0))
+DEFAULT_MAX_QUEUE = int(os.environ.get("SKIN_MAX_QUEUE", 256))
+# "RxT" or "auto" puts a ReplicaScheduler (scheduler.py) in front of the backend
+DEFAULT_REPLICAS = os.environ.get("SKIN_REPLICAS", "")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class _Request:
+    __slots__ = ("pixel_values", "future", "enqueued")
+
+    def __init__(self, pixel_values):
+        self.pixel_values = pixel_values
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """Dynamic batching of concurrent requests onto one backend.
+
+    get_backend() is called for every batch, so passing store.backend picks up
+    checkpoint reloads without restarting the batcher.
+    """
+
+    def __init__(self, get_backend, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_queue=DEFAULT_MAX_QUEUE, history=2048,
+                 on_start=None, name="micro-batcher"):
+        self.get_backend = get_backend
+        # runs first thing on the worker thread, e.g. to pin it to cores (see scheduler.py)
+        self.on_start = on_start
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = None
+        self._outstanding = 0
+        self._latencies = deque(maxlen=history)
+        self._waits = deque(maxlen=history)
+        self._batch_sizes = deque(maxlen=history)
+        self._stats_lock = threading.Lock()
+        self.counters = {"requests": 0, "images": 0, "batches": 0, "errors": 0}
+        self._closed = threading.Event()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, pixel_values, block=True, timeout=None):
+        """Queue (N, 3, H, W) or (3, H, W) pixel_values; the Future resolves to (N, num_classes) logits.
+
+        Raises queue.Full when the queue is at max_queue and block is False or timeout expires.
+        """
+        if self._closed.is_set():
+            raise RuntimeError("MicroBatcher is closed")
+        if pixel_values.dim() == 3:
+            pixel_values = pixel_values.unsqueeze(0)
+        request = _Request(pixel_values)
+        with self._stats_lock:
+            self._outstanding += 1
+        try:
+            self._queue.put(request, block=block, timeout=timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._outstanding -= 1
+            raise
+        if self._closed.is_set():
+            # raced with close(), the worker may have drained the queue already
+            self._fail(self._drain())
+        return request.future
+
+    def predict(self, pixel_values, timeout=None):
+        return self.submit(pixel_values).result(timeout)
+
+    async def predict_async(self, pixel_values):
+        return await asyncio.wrap_future(self.submit(pixel_values))
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def load(self):
+        """Requests submitted and not answered yet (queued, being batched or in the forward pass)."""
+        return self._outstanding
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = list(self._latencies)
+            waits = list(self._waits)
+            sizes = list(self._batch_sizes)
+            counters = dict(self.counters)
+        ms = lambda v: None if v is None else 1000 * v
+        return dict(
+            counters,
+            queue_depth=self._queue.qsize(),
+            mean_batch_size=sum(sizes) / len(sizes) if sizes else None,
+            latency_ms_p50=ms(percentile(latencies, 50)),
+            latency_ms_p95=ms(percentile(latencies, 95)),
+            latency_ms_p99=ms(percentile(latencies, 99)),
+            queue_wait_ms_p95=ms(percentile(waits, 95)),
+        )
+
+    def close(self, timeout=None):
+        """Stop after the batch being run; requests still queued fail with RuntimeError."""
+        self._closed.set()
+        self._worker.join(timeout)
+
+    def _drain(self):
+        requests = []
+        while True:
+            try:
+                requests.append(self._queue.get_nowait())
+            except queue.Empty:
+                return requests
+
+    def _fail(self, requests):
+        if not requests:
+            return
+        with self._stats_lock:
+            self._outstanding -= len(requests)
+        for r in requests:
+            r.future.set_exception(RuntimeError("MicroBatcher is closed"))
+
+    def _collect(self):
+        # block for the first request, then keep taking more until the batch is
+        # full or max_wait has passed since the first one arrived
+        first = None
+        while first is None:
+            if self._closed.is_set():
+                return []
+            if self._pending is not None:
+                first, self._pending = self._pending, None
+                break
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        batch, size = [first], first.pixel_values.shape[0]
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if size + request.pixel_values.shape[0] > self.max_batch_size:
+                # does not fit, it starts the next batch
+                self._pending = request
+                break
+            batch.append(request)
+            size += request.pixel_values.shape[0]
+        return batch
+
+    def _run(self):
+        if self.on_start is not None:
+            self.on_start()
+        while True:
+            batch = self._collect()
+            if not batch:
+                # closed: nobody would ever resolve what is still waiting
+                pending, self._pending = self._pending, None
+                self._fail(([pending] if pending is not None else []) + self._drain())
+                return
+            started = time.perf_counter()
+            try:
+                pixel_values = torch.cat([r.pixel_values for r in batch]) if len(batch) > 1 else batch[0].pixel_values
+                logits = self.get_backend()(pixel_values)
+            except Exception as exc:
+                with self._stats_lock:
+                    self.counters["errors"] += len(batch)
+                    self._outstanding -= len(batch)
+                for r in batch:
+                    r.future.set_exception(exc)
+                continue
+
+            offset = 0
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self.counters["requests"] += len(batch)
+                self.counters["images"] += pixel_values.shape[0]
+                self.counters["batches"] += 1
+                self._batch_sizes.append(pixel_values.shape[0])
+                self._outstanding -= len(batch)
+                for r in batch:
+                    self._latencies.append(finished - r.enqueued)
+                    self._waits.append(started - r.enqueued)
+            for r in batch:
+                n = r.pixel_values.shape[0]
+                # lets callers see how large a batch their request ended up in
+                r.future.batch_size = pixel_values.shape[0]
+                r.future.set_result(logits[offset:offset + n])
+                offset += n
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(store, backend_name=None, replicas=DEFAULT_REPLICAS, **kwargs):
+    """Process-wide MicroBatcher in front of store.backend(backend_name).
+
+    With replicas set (see scheduler.py) this is a ReplicaScheduler of pinned
+    MicroBatchers, which has the same interface.
+    """
+    key = (store.path, backend_name)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            if replicas:
+                from scheduler import scheduler_for
+                batcher = scheduler_for(store, backend_name, replicas, **kwargs)
+            else:
+                batcher = MicroBatcher(lambda: store.backend(backend_name), **kwargs)
+            _batchers[key] = batcher
+        return batcher
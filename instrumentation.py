@@ -0,0 +1,199 @@
+"""Per-stage latency instrumentation for the upload-to-result path.
+
+    tracer = get_tracer()
+    with tracer.trace("predict") as trace:
+        with trace.stage("decode") as rec:
+            image = ...
+            rec["image_size"] = image.size
+
+Every stage records wall time and the RSS delta, plus whatever attributes
+the caller adds (tensor shapes, batch sizes). Finished traces are kept in a
+small ring buffer for the debug panel, aggregated into Prometheus histograms
+(prometheus_text()) and, with SKIN_TRACE_LOG=1, logged as one JSON line each.
+
+A sample of traces can be profiled with cProfile or torch.profiler. The
+rate and mode are changed at runtime with set_profiling() (the debug panel
+does this) or by editing the JSON file named by SKIN_PROFILE_CONTROL, e.g.
+{"rate": 0.05, "mode": "torch"}; no restart is needed. cProfile only sees
+the request thread, so callers should run the forward pass inline while
+trace.profiling is set.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("skin.trace")
+
+# seconds; upper bounds of the Prometheus histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_MODES = ("cprofile", "torch")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """Resident set size in bytes, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Trace:
+    """Stage records of one request; created by Tracer.trace()."""
+
+    def __init__(self, tracer, name, profiling=None):
+        self.tracer = tracer
+        self.name = name
+        self.profiling = profiling
+        self.started = time.time()
+        self.stages = []
+        self.attrs = {}
+        self.profile_path = None
+
+    @contextmanager
+    def stage(self, name, **attrs):
+        record = dict(attrs, stage=name)
+        rss = current_rss()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            after = current_rss()
+            record["rss_delta_bytes"] = after - rss if rss is not None and after is not None else None
+            self.stages.append(record)
+
+    def to_dict(self):
+        return dict(self.attrs, name=self.name, started=self.started, stages=self.stages,
+                    total_seconds=sum(s["seconds"] for s in self.stages), profile=self.profile_path)
+
+
+class Tracer:
+    def __init__(self, history=200, profile_dir=None, control_path=None):
+        self.recent = deque(maxlen=history)
+        self.profile_dir = profile_dir or os.environ.get("SKIN_PROFILE_DIR", "./profiles")
+        self.control_path = control_path or os.environ.get("SKIN_PROFILE_CONTROL")
+        self.log_enabled = os.environ.get("SKIN_TRACE_LOG") == "1"
+        self.profile_rate = float(os.environ.get("SKIN_PROFILE_RATE", 0.0))
+        self.profile_mode = os.environ.get("SKIN_PROFILE_MODE", "cprofile")
+        self._control_mtime = None
+        self._lock = threading.Lock()
+        # stage -> [bucket counts..., +Inf count], sum
+        self._histograms = {}
+        self._sums = {}
+
+    def set_profiling(self, rate, mode="cprofile"):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"unknown profile mode {mode!r}, choose from {', '.join(PROFILE_MODES)}")
+        with self._lock:
+            self.profile_rate = max(0.0, min(1.0, float(rate)))
+            self.profile_mode = mode
+
+    @contextmanager
+    def trace(self, name="predict"):
+        self._read_control()
+        profiling = self.profile_mode if self.profile_rate and random.random() < self.profile_rate else None
+        trace = Trace(self, name, profiling)
+        profiler = self._start_profiler(profiling)
+        try:
+            yield trace
+        finally:
+            if profiler is not None:
+                trace.profile_path = self._stop_profiler(profiling, profiler, trace)
+            self._finish(trace)
+
+    def last(self):
+        with self._lock:
+            return self.recent[-1] if self.recent else None
+
+    def prometheus_text(self, gauges=None):
+        """Stage histograms in Prometheus text format, plus optional {name: value} gauges."""
+        lines = ["# HELP skin_stage_seconds Time spent in each prediction stage.",
+                 "# TYPE skin_stage_seconds histogram"]
+        with self._lock:
+            for stage in sorted(self._histograms):
+                counts = self._histograms[stage]
+                for le, count in zip(BUCKETS + ("+Inf",), counts):
+                    lines.append(f'skin_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+                lines.append(f'skin_stage_seconds_sum{{stage="{stage}"}} {self._sums[stage]}')
+                lines.append(f'skin_stage_seconds_count{{stage="{stage}"}} {counts[-1]}')
+        for name, value in sorted((gauges or {}).items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _finish(self, trace):
+        record = trace.to_dict()
+        with self._lock:
+            self.recent.append(record)
+            for stage in trace.stages:
+                name, seconds = stage["stage"], stage["seconds"]
+                counts = self._histograms.setdefault(name, [0] * (len(BUCKETS) + 1))
+                self._sums[name] = self._sums.get(name, 0.0) + seconds
+                for i, le in enumerate(BUCKETS):
+                    if seconds <= le:
+                        counts[i] += 1
+                counts[-1] += 1
+        if self.log_enabled:
+            logger.info(json.dumps(record, default=str))
+
+    def _read_control(self):
+        if not self.control_path:
+            return
+        try:
+            mtime = os.stat(self.control_path).st_mtime_ns
+            if mtime == self._control_mtime:
+                return
+            with open(self.control_path, encoding="utf-8") as f:
+                control = json.load(f)
+            self._control_mtime = mtime
+            self.set_profiling(control.get("rate", 0.0), control.get("mode", "cprofile"))
+        except (OSError, ValueError) as exc:
+            logger.debug("ignoring profile control file %s: %s", self.control_path, exc)
+
+    def _start_profiler(self, mode):
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if mode == "torch":
+            import torch
+            profiler = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU],
+                                              record_shapes=True, profile_memory=True)
+            profiler.__enter__()
+            return profiler
+        return None
+
+    def _stop_profiler(self, mode, profiler, trace):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stem = os.path.join(self.profile_dir, f"{trace.name}-{int(trace.started * 1000)}")
+        if mode == "cprofile":
+            profiler.disable()
+            path = stem + ".prof"
+            profiler.dump_stats(path)
+        else:
+            profiler.__exit__(None, None, None)
+            path = stem + ".trace.json"
+            profiler.export_chrome_trace(path)
+        return path
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
@@ -0,0 +1,184 @@
+"""Process-wide model lifecycle for the DINOv2 skin classifier.
+
+Streamlit re-executes skin.py on every interaction, but imported modules stay
+in sys.modules, so the store below is created once per server process and the
+weights are only read from disk when the checkpoint actually changes.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import torch
+
+from backends import DEFAULT_BACKEND, create_backend
+from fast_preprocess import FastPreprocessor
+from postprocess import load_temperature
+from snapshot import default_snapshot_path, load_snapshot, snapshot_fingerprint
+
+DEFAULT_MODEL_PATH = "./dinov2_skin_disease_model"
+
+# how often (seconds) get() is allowed to stat the checkpoint directory
+DEFAULT_CHECK_INTERVAL = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+def checkpoint_fingerprint(path):
+    """Cheap identity of a checkpoint directory built from file names, sizes and mtimes."""
+    entries = []
+    for root, _, files in os.walk(path):
+        for name in files:
+            full = os.path.join(root, name)
+            info = os.stat(full)
+            entries.append((os.path.relpath(full, path), info.st_size, info.st_mtime_ns))
+    entries.sort()
+    return hashlib.sha1(repr(entries).encode("utf-8")).hexdigest()
+
+
+def input_size(image_processor):
+    # (height, width) the processor hands to the model
+    crop = getattr(image_processor, "crop_size", None) or getattr(image_processor, "size", None) or {}
+    return crop.get("height", 224), crop.get("width", 224)
+
+
+def _require_snapshot():
+    # shared-weight workers (serve_multi.py) only ever load the snapshot
+    return os.environ.get("SKIN_REQUIRE_SNAPSHOT") == "1"
+
+
+class ModelStore:
+    """Holds one warmed-up (image_processor, model) pair for a checkpoint directory."""
+
+    def __init__(self, path=DEFAULT_MODEL_PATH, warmup=True, check_interval=DEFAULT_CHECK_INTERVAL,
+                 snapshot_path=None):
+        self.path = path
+        self.snapshot_path = snapshot_path or os.environ.get("SKIN_SNAPSHOT_DIR") or default_snapshot_path(path)
+        self.warmup = warmup
+        self.check_interval = check_interval
+        self.fingerprint = None
+        self.version = 0
+        self.temperature = 1.0
+        self._processor = None
+        self._model = None
+        self._fast = None
+        self._backends = {}
+        self._last_check = 0.0
+        self._stale_snapshot_warned = None
+        self._lock = threading.RLock()
+        self.metrics = {
+            "loads": 0,
+            "load_seconds": None,
+            "warmup_seconds": None,
+            "loaded_at": None,
+            "loaded_from": None,
+            "fingerprint_checks": 0,
+            "stale_snapshot_checks": 0,
+        }
+
+    def get(self):
+        """Return (image_processor, model), loading on first use or after the checkpoint changed."""
+        with self._lock:
+            if self._model is None:
+                self._load(checkpoint_fingerprint(self.path))
+            elif time.monotonic() - self._last_check >= self.check_interval:
+                self.reload_if_changed()
+            return self._processor, self._model
+
+    def fast_preprocessor(self):
+        """FastPreprocessor matching the currently loaded image processor."""
+        with self._lock:
+            self.get()
+            return self._fast
+
+    def backend(self, name=None):
+        """Inference backend (see backends.BACKENDS) built from the current model, default SKIN_BACKEND."""
+        name = name or DEFAULT_BACKEND
+        with self._lock:
+            processor, model = self.get()
+            backend = self._backends.get(name)
+            if backend is None:
+                backend = self._backends[name] = create_backend(name, model, self.fingerprint, input_size(processor))
+            return backend
+
+    def reload_if_changed(self):
+        """Reload the weights if the files under self.path changed. Returns True on reload."""
+        with self._lock:
+            self.metrics["fingerprint_checks"] += 1
+            self._last_check = time.monotonic()
+            fingerprint = checkpoint_fingerprint(self.path)
+            if self._model is not None and fingerprint == self.fingerprint:
+                return False
+            if (self._model is not None and _require_snapshot()
+                    and snapshot_fingerprint(self.snapshot_path) != fingerprint):
+                # the checkpoint changed but its snapshot is not rebuilt yet (serve_multi.py does that);
+                # keep serving the loaded weights and switch once it is
+                self.metrics["stale_snapshot_checks"] += 1
+                if self._stale_snapshot_warned != fingerprint:
+                    self._stale_snapshot_warned = fingerprint
+                    logger.warning("%s changed but %s is not rebuilt yet, serving the loaded model",
+                                   self.path, self.snapshot_path)
+                return False
+            self._load(fingerprint)
+            return True
+
+    def stats(self):
+        with self._lock:
+            return dict(self.metrics, path=self.path, version=self.version, fingerprint=self.fingerprint,
+                        temperature=self.temperature)
+
+    def _load(self, fingerprint):
+        start = time.perf_counter()
+        if _require_snapshot() and snapshot_fingerprint(self.snapshot_path) != fingerprint:
+            # shared-weight workers (serve_multi.py) must not fall back to a private copy
+            raise RuntimeError(f"no up-to-date snapshot of {self.path} at {self.snapshot_path}, run snapshot.py")
+        if snapshot_fingerprint(self.snapshot_path) == fingerprint:
+            # pre-converted snapshot of this exact checkpoint, weights are memory-mapped
+            processor, model = load_snapshot(self.snapshot_path)
+            loaded_from = "snapshot"
+        else:
+            from transformers import AutoModelForImageClassification, AutoImageProcessor
+            processor = AutoImageProcessor.from_pretrained(self.path)
+            model = AutoModelForImageClassification.from_pretrained(self.path)
+            loaded_from = "checkpoint"
+        model.eval()
+        temperature = load_temperature(self.path)
+        load_seconds = time.perf_counter() - start
+
+        warmup_seconds = None
+        if self.warmup:
+            start = time.perf_counter()
+            height, width = input_size(processor)
+            with torch.no_grad():
+                model(pixel_values=torch.zeros(1, 3, height, width))
+            warmup_seconds = time.perf_counter() - start
+
+        # swap in the new pair only once it is fully ready; callers that already
+        # hold the old model keep using it until their request finishes
+        self._processor, self._model = processor, model
+        self._fast = FastPreprocessor(processor)
+        self._backends = {}
+        self.temperature = temperature
+        self.fingerprint = fingerprint
+        self.version += 1
+        self._last_check = time.monotonic()
+        self.metrics["loads"] += 1
+        self.metrics["load_seconds"] = load_seconds
+        self.metrics["warmup_seconds"] = warmup_seconds
+        self.metrics["loaded_at"] = time.time()
+        self.metrics["loaded_from"] = loaded_from
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=DEFAULT_MODEL_PATH):
+    """Return the process-wide ModelStore for path, creating it on first use."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ModelStore(path)
+        return store
@@ -0,0 +1,80 @@
+"""Streaming decode/preprocess stage that overlaps with model forward passes.
+
+A producer thread hands each batch to a worker pool for decoding and
+preprocessing and pushes the finished batch onto a bounded queue. The caller
+runs the model on batch N while the pool is already working on batch N+1, and
+the queue bound keeps memory flat when the model is the slower side.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+
+def default_workers():
+    # leave the rest of the cores to torch's intra-op threads
+    return max(1, min(8, (os.cpu_count() or 2) // 2))
+
+
+def _run_item(fn, item):
+    try:
+        return fn(item), None
+    except Exception as exc:
+        return None, exc
+
+
+def prefetch_batches(items, preprocess, batch_size=32, workers=None, max_pending=2):
+    """Yield (batch_items, outputs, errors) for consecutive chunks of items.
+
+    preprocess(item) runs in a worker pool. outputs holds its results for the
+    items that succeeded, errors holds (item, exception) for those that failed.
+    At most max_pending preprocessed batches are buffered ahead of the caller.
+    """
+    items = list(items)
+    workers = workers or default_workers()
+    ready = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    def put(entry):
+        # block while the queue is full, but give up once the consumer went away
+        while not stop.is_set():
+            try:
+                ready.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preprocess") as pool:
+                for offset in range(0, len(items), batch_size):
+                    chunk = items[offset:offset + batch_size]
+                    ok_items, outputs, errors = [], [], []
+                    for item, (out, exc) in zip(chunk, pool.map(lambda it: _run_item(preprocess, it), chunk)):
+                        if exc is None:
+                            ok_items.append(item)
+                            outputs.append(out)
+                        else:
+                            errors.append((item, exc))
+                    if not put((ok_items, outputs, errors)):
+                        return
+            put(_DONE)
+        except BaseException as exc:
+            put(exc)
+
+    producer = threading.Thread(target=produce, name="prefetch-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            entry = ready.get()
+            if entry is _DONE:
+                return
+            if isinstance(entry, BaseException):
+                raise entry
+            yield entry
+    finally:
+        stop.set()
+        producer.join()
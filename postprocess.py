@@ -0,0 +1,150 @@
+"""Softmax / top-k post-processing shared by the app, batch and API paths.
+
+summarize() turns a batch of logits into Prediction objects in one
+vectorized pass, optionally dividing by a temperature fitted offline:
+
+    python postprocess.py --fit validation/ --model-path ./dinov2_skin_disease_model
+
+where validation/ has one sub-directory per class name. The fitted value is
+written to calibration.json inside the checkpoint directory; ModelStore picks
+it up (and the prediction cache is invalidated) on the next reload.
+"""
+import argparse
+import json
+import math
+import os
+from dataclasses import dataclass, field
+
+import torch
+
+from disease_info import class_names
+
+CALIBRATION_FILE = "calibration.json"
+DEFAULT_TOP_K = 3
+
+
+@dataclass
+class Prediction:
+    label: str
+    index: int
+    confidence: float
+    top_k: list = field(default_factory=list)  # [{"label": str, "prob": float}, ...]
+
+    def to_dict(self):
+        return {"predicted_class": self.label, "confidence": self.confidence, "top_k": self.top_k}
+
+    @classmethod
+    def from_dict(cls, data):
+        top = data["top_k"]
+        return cls(label=top[0]["label"], index=class_names.index(top[0]["label"]),
+                   confidence=top[0]["prob"], top_k=top)
+
+
+def load_temperature(model_path):
+    path = os.path.join(model_path, CALIBRATION_FILE)
+    if not os.path.exists(path):
+        return 1.0
+    with open(path, encoding="utf-8") as f:
+        return float(json.load(f)["temperature"])
+
+
+def probabilities(logits, temperature=1.0):
+    logits = torch.as_tensor(logits).float()
+    return (logits / temperature).softmax(-1)
+
+
+def summarize(logits, k=DEFAULT_TOP_K, temperature=1.0, labels=None):
+    """(N, C) or (C,) logits -> list of N Predictions with calibrated top-k probabilities."""
+    labels = labels or class_names
+    logits = torch.as_tensor(logits)
+    if logits.dim() == 1:
+        logits = logits.unsqueeze(0)
+    top_probs, top_idx = probabilities(logits, temperature).topk(min(k, logits.shape[-1]), dim=-1)
+    predictions = []
+    # one tolist() per tensor instead of .item() per element
+    for row_probs, row_idx in zip(top_probs.tolist(), top_idx.tolist()):
+        top = [{"label": labels[i], "prob": p} for p, i in zip(row_probs, row_idx)]
+        predictions.append(Prediction(label=top[0]["label"], index=row_idx[0], confidence=row_probs[0], top_k=top))
+    return predictions
+
+
+def fit_temperature(logits, targets, max_iter=100):
+    """Temperature minimising the NLL of targets under softmax(logits / T)."""
+    logits = torch.as_tensor(logits).float()
+    targets = torch.as_tensor(targets).long()
+    log_t = torch.zeros(1, requires_grad=True)
+    optimizer = torch.optim.LBFGS([log_t], lr=0.1, max_iter=max_iter)
+
+    def closure():
+        optimizer.zero_grad()
+        loss = torch.nn.functional.cross_entropy(logits / log_t.exp(), targets)
+        loss.backward()
+        return loss
+
+    optimizer.step(closure)
+    return log_t.detach().exp().item()
+
+
+def calibration_report(logits, targets, temperature=1.0, bins=15):
+    """NLL, accuracy and expected calibration error at the given temperature."""
+    logits = torch.as_tensor(logits).float()
+    targets = torch.as_tensor(targets).long()
+    probs = probabilities(logits, temperature)
+    confidence, predicted = probs.max(-1)
+    correct = (predicted == targets).float()
+    ece = 0.0
+    edges = torch.linspace(0, 1, bins + 1)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > lo) & (confidence <= hi)
+        if in_bin.any():
+            ece += in_bin.float().mean().item() * abs(confidence[in_bin].mean().item() - correct[in_bin].mean().item())
+    nll = torch.nn.functional.cross_entropy(logits / temperature, targets).item()
+    return {"temperature": temperature, "nll": nll, "accuracy": correct.mean().item(), "ece": ece}
+
+
+def labelled_images(root):
+    """(path, class index) pairs from a directory with one sub-directory per class name."""
+    from batch_infer import find_images
+
+    pairs = []
+    for name in sorted(os.listdir(root)):
+        if os.path.isdir(os.path.join(root, name)) and name in class_names:
+            pairs += [(path, class_names.index(name)) for path in find_images(os.path.join(root, name))]
+    return pairs
+
+
+def main(argv=None):
+    from batch_infer import load_image
+    from model_store import DEFAULT_MODEL_PATH, get_store
+
+    parser = argparse.ArgumentParser(description="Fit softmax temperature on a labelled validation set.")
+    parser.add_argument("--fit", required=True, metavar="DIR", help="validation images, one sub-directory per class")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--dry-run", action="store_true", help="report only, do not write calibration.json")
+    args = parser.parse_args(argv)
+
+    pairs = labelled_images(args.fit)
+    if not pairs:
+        parser.error(f"no images under class-named sub-directories of {args.fit}")
+    store = get_store(args.model_path)
+    fast, backend = store.fast_preprocessor(), store.backend(args.backend)
+    logits = []
+    for i in range(0, len(pairs), args.batch_size):
+        images = [load_image(path) for path, _ in pairs[i:i + args.batch_size]]
+        logits.append(backend(fast(images)).float())
+    logits = torch.cat(logits)
+    targets = [target for _, target in pairs]
+
+    temperature = fit_temperature(logits, targets)
+    for report in (calibration_report(logits, targets), calibration_report(logits, targets, temperature)):
+        print("T={temperature:.3f} nll={nll:.4f} ece={ece:.4f} accuracy={accuracy:.2%}".format(**report))
+    if not args.dry_run and math.isfinite(temperature):
+        with open(os.path.join(args.model_path, CALIBRATION_FILE), "w", encoding="utf-8") as f:
+            json.dump({"temperature": temperature, "images": len(pairs)}, f, indent=2)
+        print(f"wrote {os.path.join(args.model_path, CALIBRATION_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Prediction cache keyed by image content and checkpoint identity.
+
+Re-uploading the same photo (or a Streamlit rerun on the same upload) finds
+its logits here instead of running the model again. Entries live in a
+bounded in-memory LRU and, optionally, in a SQLite file that survives
+restarts and is bounded as well (oldest rows are dropped first). Every
+entry is stored under a model id that starts with the checkpoint
+fingerprint from model_store ("<fingerprint>:<backend>[:tta]..."); new
+weights invalidate the entries of the old fingerprint, while processes
+that share the file with other model ids for the same weights (the app
+with TTA, the API without) keep each other's rows.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_DISK_ENTRIES = 100_000
+# puts between two trims of the SQLite tier, the row count may overshoot by this much
+TRIM_EVERY = 64
+
+
+def image_key(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def model_fingerprint(model_id):
+    return model_id.split(":", 1)[0]
+
+
+class PredictionCache:
+    """LRU of {"logits": np.ndarray, "top_k": [...], "features": np.ndarray or None} with an optional SQLite tier.
+
+    features is the image embedding for the similar-case search, kept when
+    the caller has one so a cache hit does not need another backbone pass.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, db_path=None, max_disk_entries=DEFAULT_MAX_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.db_path = db_path
+        self.fingerprint = None
+        self._entries = OrderedDict()  # (model_id, image key) -> entry
+        self._lock = threading.Lock()
+        self._db = None
+        self._puts_since_trim = 0
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0,
+                         "invalidations": 0}
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            columns = self._db.execute("PRAGMA table_info(predictions)").fetchall()
+            if columns and sorted(c[1] for c in columns if c[5]) != ["key", "model_id"]:
+                # older file keyed by image alone, where model ids overwrote each other; it is only a cache
+                self._db.execute("DROP TABLE predictions")
+            elif columns and "features" not in {c[1] for c in columns}:
+                self._db.execute("ALTER TABLE predictions ADD COLUMN features BLOB")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " key TEXT NOT NULL, model_id TEXT NOT NULL, logits BLOB NOT NULL, top_k TEXT NOT NULL,"
+                " features BLOB, PRIMARY KEY (key, model_id))"
+            )
+            self._db.commit()
+
+    def get(self, image_bytes, model_id):
+        """Cached entry for these image bytes under model_id, or None."""
+        key = (model_id, image_key(image_bytes))
+        with self._lock:
+            self._check_model(model_id)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT logits, top_k, features FROM predictions WHERE key = ? AND model_id = ?",
+                    (key[1], model_id),
+                ).fetchone()
+                if row is not None:
+                    entry = {"logits": np.frombuffer(row[0], dtype=np.float32), "top_k": json.loads(row[1]),
+                             "features": None if row[2] is None else np.frombuffer(row[2], dtype=np.float32)}
+                    self._remember(key, entry)
+                    self.counters["disk_hits"] += 1
+                    return entry
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, image_bytes, model_id, logits, top_k, features=None):
+        key = (model_id, image_key(image_bytes))
+        entry = {"logits": np.asarray(logits, dtype=np.float32).reshape(-1), "top_k": top_k,
+                 "features": None if features is None else np.asarray(features, dtype=np.float32).reshape(-1)}
+        with self._lock:
+            self._check_model(model_id)
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions (key, model_id, logits, top_k, features) VALUES (?, ?, ?, ?, ?)",
+                    (key[1], model_id, entry["logits"].tobytes(), json.dumps(top_k),
+                     None if entry["features"] is None else entry["features"].tobytes()),
+                )
+                self._puts_since_trim += 1
+                if self._puts_since_trim >= TRIM_EVERY:
+                    self._trim_disk()
+                self._db.commit()
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), max_entries=self.max_entries,
+                        max_disk_entries=self.max_disk_entries if self._db is not None else None)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _trim_disk(self):
+        # INSERT OR REPLACE gives a row the next rowid, so the lowest rowids were written longest ago
+        self._puts_since_trim = 0
+        deleted = self._db.execute(
+            "DELETE FROM predictions WHERE rowid <="
+            " (SELECT rowid FROM predictions ORDER BY rowid DESC LIMIT 1 OFFSET ?)", (self.max_disk_entries,)
+        ).rowcount
+        self.counters["disk_evictions"] += max(deleted, 0)
+
+    def _check_model(self, model_id):
+        # the first request after a checkpoint change drops everything from the old weights;
+        # other model ids of the same weights (backend, :tta, :cascade) stay
+        fingerprint = model_fingerprint(model_id)
+        if fingerprint == self.fingerprint:
+            return
+        if self.fingerprint is not None:
+            self.counters["invalidations"] += 1
+        self._entries.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM predictions WHERE model_id != ? AND substr(model_id, 1, ?) != ?",
+                             (fingerprint, len(fingerprint) + 1, fingerprint + ":"))
+            self._db.commit()
+        self.fingerprint = fingerprint
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """Process-wide cache; SKIN_CACHE_DB enables the SQLite tier, SKIN_CACHE_SIZE / SKIN_CACHE_DB_SIZE bound them."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PredictionCache(
+                max_entries=int(os.environ.get("SKIN_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+                db_path=os.environ.get("SKIN_CACHE_DB") or None,
+                max_disk_entries=int(os.environ.get("SKIN_CACHE_DB_SIZE", DEFAULT_MAX_DISK_ENTRIES)),
+            )
+        return _cache
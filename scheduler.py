@@ -0,0 +1,237 @@
+"""Replica/thread layout for the inference path, tuned to the host's cores.
+
+With PyTorch's defaults every forward pass uses all cores, so concurrent
+sessions oversubscribe them. A scheduler instead runs R replicas with T
+intra-op threads each, every replica pinned to its own group of physical
+cores (SMT siblings stay together, groups do not straddle sockets where
+that can be avoided). Replicas are MicroBatcher workers that share the same
+weights, so a replica costs a thread and its activations, not a model copy;
+ReplicaScheduler sends each request to the least-loaded one.
+
+Which layout is fastest depends on the host and on the backend, so
+tune() measures the throughput of every candidate (1 x all cores, 2 x half,
+... down to one core per replica) with concurrent forward passes:
+
+    python scheduler.py --model-path ./dinov2_skin_disease_model
+
+The app and API use a scheduler when SKIN_REPLICAS is set, either to a
+layout such as "2x4" (2 replicas with 4 threads each) or to "auto" to run
+tune() once at startup.
+
+Note: the ONNX backend sizes its own thread pool when the session is built;
+pinning still applies to it, the per-replica thread count does not.
+"""
+import argparse
+import asyncio
+import os
+import queue
+import sys
+import threading
+import time
+
+import torch
+
+from inference_server import MicroBatcher
+
+DEFAULT_TUNE_SECONDS = 3.0
+DEFAULT_TUNE_BATCH_SIZE = 8
+
+
+def cpu_topology():
+    """Physical cores usable by this process, as lists of logical CPU ids grouped by socket and core."""
+    allowed = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    cores = {}
+    for cpu in allowed:
+        base = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+        try:
+            with open(os.path.join(base, "physical_package_id")) as f:
+                package = int(f.read())
+            with open(os.path.join(base, "core_id")) as f:
+                core = int(f.read())
+        except (OSError, ValueError):
+            # no sysfs (containers, non-Linux): treat every CPU as its own core
+            package, core = 0, cpu
+        cores.setdefault((package, core), []).append(cpu)
+    return [cores[key] for key in sorted(cores)]
+
+
+def candidate_layouts(n_cores):
+    """(replicas, threads per replica) splits that use every core, largest replica first."""
+    return [(n_cores // threads, threads) for threads in range(n_cores, 0, -1) if n_cores % threads == 0]
+
+
+def core_groups(cores, replicas):
+    """Split the physical cores into `replicas` contiguous groups of logical CPU ids."""
+    per_replica = len(cores) // replicas
+    return [sorted(cpu for core in cores[i * per_replica:(i + 1) * per_replica] for cpu in core)
+            for i in range(replicas)]
+
+
+def pin_current_thread(cpus, threads):
+    """Pin the calling thread (and the OpenMP pool it creates) to cpus and size its intra-op pool."""
+    if hasattr(os, "sched_setaffinity"):
+        # pid 0 is the calling thread on Linux; threads started from it inherit the mask
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+
+
+def set_interop_threads(n=1):
+    # one replica per core group already gives parallelism across requests
+    try:
+        torch.set_num_interop_threads(n)
+    except RuntimeError:
+        # can only be set before the first inter-op parallel work in this process
+        pass
+
+
+def measure(backend, sample, layout, cores, seconds=DEFAULT_TUNE_SECONDS):
+    """Images per second of `layout` with every replica running forward passes back to back."""
+    replicas, threads = layout
+    groups = core_groups(cores, replicas)
+    counts = [0] * replicas
+    ready = threading.Barrier(replicas + 1)
+    stop = threading.Event()
+
+    def work(i):
+        pin_current_thread(groups[i], threads)
+        backend(sample)  # warm-up outside the timed window
+        ready.wait()
+        while not stop.is_set():
+            backend(sample)
+            counts[i] += len(sample)
+
+    workers = [threading.Thread(target=work, args=(i,), daemon=True) for i in range(replicas)]
+    for worker in workers:
+        worker.start()
+    ready.wait()
+    start = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def tune(backend, input_size=(224, 224), cores=None, layouts=None, batch_size=DEFAULT_TUNE_BATCH_SIZE,
+         seconds=DEFAULT_TUNE_SECONDS, log=None):
+    """Measure every candidate layout; returns (best layout, {layout: images/s})."""
+    cores = cores or cpu_topology()
+    layouts = layouts or candidate_layouts(len(cores))
+    sample = torch.zeros(batch_size, 3, *input_size)
+    results = {}
+    for layout in layouts:
+        results[layout] = measure(backend, sample, layout, cores, seconds)
+        if log:
+            log(f"{layout[0]} replica(s) x {layout[1]} thread(s): {results[layout]:.1f} images/s")
+    return max(results, key=results.get), results
+
+
+def parse_layout(text):
+    replicas, _, threads = text.lower().partition("x")
+    return int(replicas), int(threads)
+
+
+class ReplicaScheduler:
+    """Several pinned MicroBatchers behind the MicroBatcher interface.
+
+    submit() goes to the replica with the fewest queued and running
+    requests, so a long batch on one replica does not hold up the others.
+    """
+
+    def __init__(self, get_backend, layout, cores=None, **batcher_kwargs):
+        self.layout = layout
+        replicas, threads = layout
+        cores = cores or cpu_topology()
+        if replicas * threads > len(cores):
+            raise ValueError(f"layout {replicas}x{threads} needs {replicas * threads} cores, "
+                             f"only {len(cores)} are available")
+        self.groups = core_groups(cores[:replicas * threads], replicas)
+        set_interop_threads(1)
+        self.replicas = [
+            MicroBatcher(get_backend, on_start=lambda cpus=cpus: pin_current_thread(cpus, threads),
+                         name=f"replica-{i}", **batcher_kwargs)
+            for i, cpus in enumerate(self.groups)
+        ]
+        self.dispatched = [0] * replicas
+        self._lock = threading.Lock()
+
+    def _least_loaded(self):
+        loads = [replica.load() for replica in self.replicas]
+        index = loads.index(min(loads))
+        self.dispatched[index] += 1
+        return self.replicas[index]
+
+    def submit(self, pixel_values, block=True, timeout=None):
+        # choose and enqueue atomically so concurrent callers see each other's load
+        with self._lock:
+            replica = self._least_loaded()
+            try:
+                return replica.submit(pixel_values, block=False)
+            except queue.Full:
+                if not block:
+                    raise
+        return replica.submit(pixel_values, block=True, timeout=timeout)
+
+    def predict(self, pixel_values, timeout=None):
+        return self.submit(pixel_values).result(timeout)
+
+    async def predict_async(self, pixel_values):
+        return await asyncio.wrap_future(self.submit(pixel_values))
+
+    def queue_depth(self):
+        return sum(replica.queue_depth() for replica in self.replicas)
+
+    def load(self):
+        return sum(replica.load() for replica in self.replicas)
+
+    def stats(self):
+        per_replica = [replica.stats() for replica in self.replicas]
+        totals = {key: sum(s[key] for s in per_replica) for key in ("requests", "images", "batches", "errors")}
+        worst = lambda key: max((s[key] for s in per_replica if s[key] is not None), default=None)
+        return dict(totals, replicas=len(self.replicas), threads_per_replica=self.layout[1],
+                    queue_depth=self.queue_depth(),
+                    latency_ms_p95=worst("latency_ms_p95"), latency_ms_p99=worst("latency_ms_p99"),
+                    queue_wait_ms_p95=worst("queue_wait_ms_p95"),
+                    dispatched=list(self.dispatched))
+
+    def close(self, timeout=None):
+        for replica in self.replicas:
+            replica.close(timeout)
+
+
+def scheduler_for(store, backend_name=None, spec="auto", **batcher_kwargs):
+    """ReplicaScheduler in front of store.backend(backend_name) for a layout spec ("RxT" or "auto")."""
+    from model_store import input_size
+
+    get_backend = lambda: store.backend(backend_name)
+    if spec == "auto":
+        processor, _ = store.get()
+        layout, results = tune(get_backend(), input_size(processor))
+        print("scheduler: " + ", ".join(f"{r}x{t} {v:.1f}/s" for (r, t), v in results.items())
+              + f" -> using {layout[0]}x{layout[1]}", file=sys.stderr)
+    else:
+        layout = parse_layout(spec)
+    return ReplicaScheduler(get_backend, layout, **batcher_kwargs)
+
+
+def main(argv=None):
+    from model_store import DEFAULT_MODEL_PATH, get_store, input_size
+
+    parser = argparse.ArgumentParser(description="Measure replica x thread layouts on this host.")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_TUNE_BATCH_SIZE)
+    parser.add_argument("--seconds", type=float, default=DEFAULT_TUNE_SECONDS)
+    args = parser.parse_args(argv)
+
+    cores = cpu_topology()
+    print(f"{len(cores)} physical cores: {cores}", file=sys.stderr)
+    store = get_store(args.model_path)
+    processor, _ = store.get()
+    best, _ = tune(store.backend(args.backend), input_size(processor), cores, batch_size=args.batch_size,
+                   seconds=args.seconds, log=lambda line: print(line, file=sys.stderr))
+    print(f"best: SKIN_REPLICAS={best[0]}x{best[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Start the Streamlit app with the model loaded at process start.
+
+Streamlit only executes skin.py when a browser session connects, so a
+replica started with `streamlit run skin.py` stays cold, and its readiness
+probe red, until someone opens the page; behind a load balancer that waits
+for readiness before sending traffic, nobody ever does. This launcher loads
+and warms the model in a background thread as soon as the process starts,
+writes the ready file (see startup.py) once that is done, and runs the
+normal Streamlit server in the foreground. skin.py runs in the same process
+and finds the warmed store, backend, batcher and cascade already in
+sys.modules.
+
+    python serve.py --server.port 8501 --server.headless true   # any `streamlit run` option
+"""
+import argparse
+import os
+import sys
+import threading
+import traceback
+
+# stdlib only, safe to import before the ML stack
+from startup import report as startup_report
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "skin.py")
+# the checkpoint skin.py loads
+MODEL_PATH = "./dinov2_skin_disease_model"
+
+
+def warm(model_path=MODEL_PATH):
+    """Load and warm the model, backend, batcher and (SKIN_CASCADE=1) cascade, then mark the replica ready."""
+    with startup_report.phase("import_ml"):
+        from inference_server import get_batcher
+        from model_store import get_store
+    with startup_report.phase("load_model"):
+        store = get_store(model_path)
+        store.get()
+        store.backend()
+    get_batcher(store)
+    if os.environ.get("SKIN_CASCADE") == "1":
+        from cascade import get_cascade
+        with startup_report.phase("load_cascade"):
+            get_cascade(store)
+    startup_report.mark_ready(model=store.stats())
+
+
+def _warm_in_background(model_path):
+    try:
+        warm(model_path)
+    except Exception:
+        # the replica stays unready; skin.py will show the same error to the first visitor
+        print("warm-up failed, not marking the replica ready:", file=sys.stderr)
+        traceback.print_exc()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Streamlit app with the model warmed at process start.",
+                                     epilog="Other options are passed on to `streamlit run`.")
+    parser.add_argument("--app", default=APP, help="Streamlit script to run (default: skin.py)")
+    args, streamlit_args = parser.parse_known_args(argv)
+
+    threading.Thread(target=_warm_in_background, args=(MODEL_PATH,), name="warmup", daemon=True).start()
+
+    from streamlit.web import cli
+    sys.argv = ["streamlit", "run", args.app, *streamlit_args]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
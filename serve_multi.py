@@ -0,0 +1,149 @@
+"""Run several Streamlit workers that share one copy of the model weights.
+
+    python serve_multi.py --workers 4 --base-port 8501
+
+The parent makes sure an up-to-date snapshot of the checkpoint exists
+(see snapshot.py), maps its weights once to pull them into the page cache,
+and starts the workers through serve.py (so each one loads the model and
+turns ready without waiting for a visitor) with SKIN_REQUIRE_SNAPSHOT=1.
+Every worker then memory-maps the same weights.pt: the pages are
+file-backed and never
+written, so all processes share the same physical copy and each worker
+only adds its own activations, Python heap and framework state. RSS counts
+shared pages in every process, so the periodic report shows PSS (shared
+pages split between the processes that map them) next to RSS.
+
+The parent also watches the checkpoint: when its files change (new weights,
+calibration.json from postprocess.py --fit, head_training.py output) it
+rebuilds the snapshot, and the workers, which keep serving the loaded model
+while the snapshot is stale, switch over on their next fingerprint check.
+
+Backends that rewrite the weights (SKIN_BACKEND=int8 or onnx) build private
+copies and lose the sharing.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from model_store import DEFAULT_CHECK_INTERVAL, DEFAULT_MODEL_PATH, checkpoint_fingerprint
+from snapshot import WEIGHTS_FILE, create_snapshot, default_snapshot_path, snapshot_fingerprint
+
+
+def memory_kb(pid):
+    """{"rss": kB, "pss": kB, "shared": kB} from /proc, empty where unavailable."""
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared"}
+    result = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    result[fields[key]] = int(rest.split()[0])
+    except OSError:
+        pass
+    return result
+
+
+def prefault(path, chunk=16 << 20):
+    # read the file once so the workers' mmaps hit the page cache
+    with open(path, "rb") as f:
+        while f.read(chunk):
+            pass
+
+
+def ensure_snapshot(model_path, snapshot_path):
+    """Rebuild the snapshot if it does not match the checkpoint; returns True when it was rebuilt."""
+    if snapshot_fingerprint(snapshot_path) == checkpoint_fingerprint(model_path):
+        return False
+    print(f"converting {model_path} -> {snapshot_path}", file=sys.stderr)
+    create_snapshot(model_path, snapshot_path)
+    prefault(os.path.join(snapshot_path, WEIGHTS_FILE))
+    return True
+
+
+def start_worker(port, args, snapshot_path):
+    env = dict(os.environ, SKIN_SNAPSHOT_DIR=os.path.abspath(snapshot_path), SKIN_REQUIRE_SNAPSHOT="1",
+               SKIN_READY_FILE=f"{args.ready_prefix}.{port}")
+    cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py"),
+           "--app", args.app, "--server.port", str(port), "--server.headless", "true"]
+    return subprocess.Popen(cmd, env=env)
+
+
+def report(workers):
+    total_rss = total_pss = 0
+    for port, proc in sorted(workers.items()):
+        mem = memory_kb(proc.pid)
+        total_rss += mem.get("rss", 0)
+        total_pss += mem.get("pss", 0)
+        print(f"  worker :{port} pid {proc.pid}: rss {mem.get('rss', 0) / 1024:.0f} MB, "
+              f"pss {mem.get('pss', 0) / 1024:.0f} MB, shared {mem.get('shared', 0) / 1024:.0f} MB", file=sys.stderr)
+    print(f"  total: rss {total_rss / 1024:.0f} MB, pss {total_pss / 1024:.0f} MB", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve skin.py from several processes sharing one weight copy.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--base-port", type=int, default=8501)
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--snapshot", default=None, help="snapshot directory (default: <model-path>.snapshot)")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "skin.py"))
+    parser.add_argument("--ready-prefix", default="/tmp/skin-classifier.ready")
+    parser.add_argument("--report-every", type=float, default=60.0, help="seconds between memory reports, 0 = off")
+    parser.add_argument("--check-every", type=float, default=DEFAULT_CHECK_INTERVAL,
+                        help="seconds between checks of the checkpoint for changes")
+    args = parser.parse_args(argv)
+
+    if os.environ.get("SKIN_BACKEND", "eager") != "eager":
+        print("warning: SKIN_BACKEND is not eager, workers will hold private weight copies", file=sys.stderr)
+    snapshot_path = args.snapshot or default_snapshot_path(args.model_path)
+    if not ensure_snapshot(args.model_path, snapshot_path):
+        prefault(os.path.join(snapshot_path, WEIGHTS_FILE))
+
+    workers = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for i in range(args.workers):
+        port = args.base_port + i
+        workers[port] = start_worker(port, args, snapshot_path)
+        print(f"started worker :{port} (pid {workers[port].pid})", file=sys.stderr)
+
+    last_report = last_check = time.monotonic()
+    try:
+        while not stopping:
+            time.sleep(1.0)
+            if time.monotonic() - last_check >= args.check_every:
+                last_check = time.monotonic()
+                try:
+                    ensure_snapshot(args.model_path, snapshot_path)
+                except Exception as exc:
+                    # e.g. caught halfway through a checkpoint being written; try again next time
+                    print(f"snapshot rebuild failed, retrying: {exc}", file=sys.stderr)
+            for port, proc in list(workers.items()):
+                if proc.poll() is not None and not stopping:
+                    print(f"worker :{port} exited with {proc.returncode}, restarting", file=sys.stderr)
+                    workers[port] = start_worker(port, args, snapshot_path)
+            if args.report_every and time.monotonic() - last_report >= args.report_every:
+                report(workers)
+                last_report = time.monotonic()
+    finally:
+        for proc in workers.values():
+            proc.terminate()
+        for proc in workers.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Pre-serialized model snapshot for fast cold starts.
+
+from_pretrained resolves the Auto* class, reads and validates the
+checkpoint and initialises weights before overwriting them. A snapshot is
+converted once from the checkpoint and then loads by building the model
+class on the meta device and assigning memory-mapped tensors, so no weight
+is read until it is touched:
+
+    python snapshot.py --model-path ./dinov2_skin_disease_model
+
+writes ./dinov2_skin_disease_model.snapshot/ with weights.pt, config.json,
+preprocessor_config.json and snapshot.json (recording the fingerprint of
+the checkpoint it came from). ModelStore uses the snapshot whenever it is
+present and matches the current checkpoint.
+
+The weights are written with torch.save and loaded with
+torch.load(mmap=True): safetensors' load_file copies tensors into process
+memory, while torch's loader keeps them backed by the file mapping.
+"""
+import argparse
+import importlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import torch
+
+WEIGHTS_FILE = "weights.pt"
+META_FILE = "snapshot.json"
+
+
+def default_snapshot_path(model_path):
+    return os.path.normpath(model_path) + ".snapshot"
+
+
+def snapshot_fingerprint(snapshot_path):
+    """Fingerprint of the checkpoint the snapshot was made from, or None if there is no snapshot."""
+    try:
+        with open(os.path.join(snapshot_path, META_FILE), encoding="utf-8") as f:
+            return json.load(f)["source_fingerprint"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def create_snapshot(model_path, snapshot_path=None):
+    from transformers import AutoModelForImageClassification, AutoImageProcessor
+    from model_store import checkpoint_fingerprint
+
+    snapshot_path = snapshot_path or default_snapshot_path(model_path)
+    fingerprint = checkpoint_fingerprint(model_path)
+    model = AutoModelForImageClassification.from_pretrained(model_path).eval()
+    processor = AutoImageProcessor.from_pretrained(model_path)
+
+    tmp = snapshot_path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    model.config.save_pretrained(tmp)
+    processor.save_pretrained(tmp)
+    torch.save({k: v.contiguous() for k, v in model.state_dict().items()}, os.path.join(tmp, WEIGHTS_FILE))
+    with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(model_path), "source_fingerprint": fingerprint,
+                   "architecture": type(model).__name__, "module": type(model).__module__,
+                   "config_class": type(model.config).__name__, "config_module": type(model.config).__module__,
+                   "torch": torch.__version__,
+                   "created_at": time.time()}, f, indent=2)
+    # swap the finished snapshot in as a whole
+    shutil.rmtree(snapshot_path, ignore_errors=True)
+    os.replace(tmp, snapshot_path)
+    return snapshot_path
+
+
+class SnapshotImageProcessor:
+    """Processor settings read straight from preprocessor_config.json.
+
+    FastPreprocessor only needs the settings, so the Hugging Face processor
+    (and AutoImageProcessor's class resolution) is built only if something
+    actually calls it or asks for an attribute the JSON does not have.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._processor = None
+        with open(os.path.join(path, "preprocessor_config.json"), encoding="utf-8") as f:
+            self._config = json.load(f)
+
+    def _real(self):
+        if self._processor is None:
+            from transformers import AutoImageProcessor
+            self._processor = AutoImageProcessor.from_pretrained(self._path)
+        return self._processor
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._config:
+            return self._config[name]
+        return getattr(self._real(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._real()(*args, **kwargs)
+
+
+def load_snapshot(snapshot_path):
+    """(image_processor, model) from a snapshot, with weights memory-mapped from weights.pt."""
+    with open(os.path.join(snapshot_path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    # import the concrete classes directly instead of going through the Auto* registries
+    config_class = getattr(importlib.import_module(meta["config_module"]), meta["config_class"])
+    model_class = getattr(importlib.import_module(meta["module"]), meta["architecture"])
+    config = config_class.from_json_file(os.path.join(snapshot_path, "config.json"))
+    with torch.device("meta"):
+        model = model_class(config)
+    state = torch.load(os.path.join(snapshot_path, WEIGHTS_FILE), mmap=True, weights_only=True, map_location="cpu")
+    model.load_state_dict(state, assign=True, strict=True)
+    leftover = [name for name, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if leftover:
+        raise RuntimeError(f"snapshot {snapshot_path} does not cover {', '.join(leftover)}")
+    model.eval()
+    return SnapshotImageProcessor(snapshot_path), model
+
+
+def main(argv=None):
+    from model_store import DEFAULT_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Convert the checkpoint into a fast-loading snapshot.")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--output", default=None, help="snapshot directory (default: <model-path>.snapshot)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    path = create_snapshot(args.model_path, args.output)
+    print(f"wrote {path} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    start = time.perf_counter()
+    load_snapshot(path)
+    print(f"snapshot loads in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
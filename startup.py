@@ -0,0 +1,93 @@
+"""Startup phase timing and a readiness marker.
+
+This module only uses the standard library so it can be imported before
+torch/transformers. serve.py (and skin.py, for a plain `streamlit run`)
+wraps each startup phase in report.phase(...) and calls mark_ready() once
+the model is warm; mark_ready() writes the report to SKIN_READY_FILE
+(api.py uses its own, SKIN_API_READY_FILE), which is what the readiness
+probe checks. Start replicas with serve.py:
+Streamlit only runs skin.py when a session connects, so without it a fresh
+replica is not ready until its first visitor.
+
+    python startup.py --probe     # exit 0 when this replica is ready
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+READY_FILE = os.environ.get("SKIN_READY_FILE", "/tmp/skin-classifier.ready")
+
+_T0 = time.perf_counter()
+
+
+class StartupReport:
+    def __init__(self):
+        self.phases = []
+        self.ready = False
+        self.ready_after = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        # Streamlit reruns pass through the same code; only the first pass is startup
+        if self.ready:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append({"phase": name, "seconds": time.perf_counter() - start,
+                                    "since_start": time.perf_counter() - _T0})
+
+    def mark_ready(self, path=READY_FILE, **extra):
+        with self._lock:
+            if self.ready:
+                return
+            self.ready = True
+            self.ready_after = time.perf_counter() - _T0
+        report = dict(self.to_dict(), pid=os.getpid(), **extra)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp, path)
+        print(f"ready after {self.ready_after:.2f}s: "
+              + ", ".join(f"{p['phase']} {p['seconds']:.2f}s" for p in self.phases), file=sys.stderr)
+
+    def to_dict(self):
+        with self._lock:
+            return {"ready": self.ready, "ready_after_seconds": self.ready_after, "phases": list(self.phases)}
+
+
+report = StartupReport()
+
+
+def probe(path=READY_FILE):
+    """True when the ready file exists and the process that wrote it is still alive."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            pid = json.load(f)["pid"]
+        os.kill(pid, 0)
+    except (OSError, ValueError, KeyError):
+        return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Readiness probe for the skin classifier.")
+    parser.add_argument("--probe", action="store_true", help="exit 0 if ready, 1 otherwise")
+    parser.add_argument("--ready-file", default=READY_FILE)
+    args = parser.parse_args(argv)
+    if args.probe:
+        sys.exit(0 if probe(args.ready_file) else 1)
+    with open(args.ready_file, encoding="utf-8") as f:
+        print(f.read())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+transformers = pytest.importorskip("transformers")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from disease_info import class_names  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    # randomly initialised two-layer DINOv2 with the real label set, enough to exercise the API
+    path = str(tmp_path_factory.mktemp("model"))
+    config = transformers.Dinov2Config(
+        hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64, patch_size=14,
+        image_size=224, num_labels=len(class_names), id2label=dict(enumerate(class_names)),
+        label2id={name: i for i, name in enumerate(class_names)})
+    transformers.Dinov2ForImageClassification(config).save_pretrained(path)
+    transformers.BitImageProcessor(
+        size={"shortest_edge": 256}, crop_size={"height": 224, "width": 224}, do_center_crop=True,
+        image_mean=[0.485, 0.456, 0.406], image_std=[0.229, 0.224, 0.225]).save_pretrained(path)
+    return path
+
+
+def png(seed, size=(96, 72)):
+    rng = np.random.default_rng(seed)
+    buf = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def reference(model_path, data, k=3):
+    """The prediction for data computed directly, without the API, batcher or cache."""
+    from decode import decode
+    from model_store import get_store
+    from postprocess import summarize
+
+    store = get_store(model_path)
+    fast = store.fast_preprocessor()
+    logits = store.backend()(fast([decode(data, fast.decode_size)]))
+    return summarize(logits, k=k, temperature=store.temperature)[0]
+
+
+def make_client(model_path, **kwargs):
+    from api import create_app
+    return TestClient(create_app(model_path, **kwargs))
+
+
+def test_predict(model_path):
+    with make_client(model_path) as client:
+        assert client.get("/readyz").status_code == 200
+        data = png(1)
+        response = client.post("/predict", files={"file": ("a.png", data, "image/png")})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        expected = reference(model_path, data)
+        assert body["filename"] == "a.png"
+        assert body["predicted_class"] == expected.label
+        assert [c["label"] for c in body["top_k"]] == [c["label"] for c in expected.top_k]
+        assert body["confidence"] == pytest.approx(expected.confidence, abs=1e-5)
+
+
+def test_predict_rejects_unreadable_image(model_path):
+    with make_client(model_path) as client:
+        response = client.post("/predict", files={"file": ("a.png", b"not an image", "image/png")})
+        assert response.status_code == 400
+
+
+def test_bulk_streams_one_line_per_image(model_path):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("x/b.png", png(3))
+        z.writestr("x/c.png", png(4))
+        z.writestr("notes.txt", "skipped, not an image")
+    files = [("files", ("a.png", png(2), "image/png")),
+             ("files", ("broken.jpg", b"\xff\xd8 truncated", "image/jpeg")),
+             ("files", ("cases.zip", archive.getvalue(), "application/zip"))]
+    with make_client(model_path, bulk_batch_size=2) as client:
+        with client.stream("POST", "/predict/bulk", files=files) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in response.iter_lines() if line]
+    by_name = {line["filename"]: line for line in lines}
+    assert sorted(by_name) == ["a.png", "broken.jpg", "cases.zip/x/b.png", "cases.zip/x/c.png"]
+    assert "error" in by_name["broken.jpg"]
+    assert by_name["cases.zip/x/c.png"]["predicted_class"] == reference(model_path, png(4)).label
+
+
+def test_oversized_upload_is_413(model_path):
+    with make_client(model_path, max_upload_bytes=1024) as client:
+        # refused from the Content-Length header
+        response = client.post("/predict", files={"file": ("a.png", b"x" * 200_000, "image/png")})
+        assert response.status_code == 413
+        # under the header slack, refused while reading the part
+        response = client.post("/predict", files={"file": ("a.png", b"x" * 10_000, "image/png")})
+        assert response.status_code == 413
+
+
+def test_zip_bomb_is_413(model_path):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("huge.png", b"\0" * (4 << 20))
+    assert len(archive.getvalue()) < 64 * 1024
+    with make_client(model_path, max_bulk_bytes=1 << 20) as client:
+        response = client.post("/predict/bulk", files=[("files", ("bomb.zip", archive.getvalue(), "application/zip"))])
+        assert response.status_code == 413
+
+
+def test_busy_is_429_with_retry_after(model_path):
+    with make_client(model_path, max_concurrency=0) as client:
+        response = client.post("/predict", files={"file": ("a.png", png(5), "image/png")})
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+
+
+def test_concurrent_requests_get_their_own_prediction(model_path):
+    from api import create_app
+    from model_store import get_store
+
+    get_store(model_path).get()
+    images = [png(1000 + i) for i in range(40)]
+    expected = [reference(model_path, data) for data in images]
+
+    async def run():
+        import anyio.to_thread
+        # few worker threads, so preprocessing threads are reused while earlier requests wait in the batcher
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 2
+        transport = httpx.ASGITransport(app=create_app(model_path, max_concurrency=64))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/predict", files={"file": (f"{i}.png", data, "image/png")})
+                for i, data in enumerate(images)))
+
+    for response, want in zip(asyncio.run(run()), expected):
+        assert response.status_code == 200, response.text
+        got = response.json()
+        assert [c["label"] for c in got["top_k"]] == [c["label"] for c in want.top_k]
+        assert [c["prob"] for c in got["top_k"]] == pytest.approx([c["prob"] for c in want.top_k], abs=1e-5)
@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pytest
+
+from embeddings import CaseIndex
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def metas(start, n):
+    return [{"path": f"img{i}.jpg", "label": f"class{i % 3}"} for i in range(start, start + n)]
+
+
+def interrupted_add(index, data):
+    # what add() leaves behind when killed after writing the rows but before saving index.json
+    with open(index._vectors_path, "ab") as f:
+        f.write(data.astype(np.float16).tobytes())
+    offsets = []
+    with open(index._meta_path, "ab") as f:
+        for meta in metas(len(index), len(data)):
+            offsets.append(f.tell())
+            f.write((json.dumps(meta) + "\n").encode("utf-8"))
+    with open(index._offsets_path, "ab") as f:
+        f.write(np.asarray(offsets, dtype=np.int64).tobytes())
+
+
+def test_add_and_exact_search(tmp_path):
+    index = CaseIndex(str(tmp_path), dim=8)
+    data = vectors(20)
+    index.add(data, metas(0, 20))
+    assert len(index) == 20
+    row, similarity, meta = index.search(data[7], k=3)[0]
+    assert row == 7 and similarity == pytest.approx(1.0, abs=1e-3)
+    assert meta == {"path": "img7.jpg", "label": "class1"}
+    assert [m["path"] for m in index.iter_metadata()] == [f"img{i}.jpg" for i in range(20)]
+
+    reopened = CaseIndex(str(tmp_path))
+    assert len(reopened) == 20 and reopened.metadata(19)["path"] == "img19.jpg"
+
+
+def test_trained_search_finds_every_row(tmp_path):
+    index = CaseIndex(str(tmp_path), dim=8, nlist=4)
+    data = vectors(200)
+    index.add(data[:100], metas(0, 100))
+    index.train()
+    # rows added after training go straight into the inverted lists
+    index.add(data[100:], metas(100, 100))
+    assert index.centroids is not None
+    for row in (3, 150, 199):
+        assert index.search(data[row], k=1, nprobe=4)[0][0] == row
+
+
+def test_train_starts_once_the_index_is_large_enough(tmp_path, monkeypatch):
+    monkeypatch.setattr("embeddings.TRAIN_FACTOR", 5)
+    index = CaseIndex(str(tmp_path), dim=8, nlist=2)
+    index.add(vectors(9), metas(0, 9))
+    assert not index.state["trained"]
+    index.add(vectors(1, seed=1), metas(9, 1))
+    assert index.state["trained"] and CaseIndex(str(tmp_path)).centroids is not None
+
+
+def test_reader_leaves_rows_being_added_alone(tmp_path):
+    writer = CaseIndex(str(tmp_path), dim=8)
+    data = vectors(10)
+    writer.add(data[:5], metas(0, 5))
+    # the writer has appended the next rows but not saved index.json yet when the app opens the index
+    interrupted_add(writer, data[5:])
+    reader = CaseIndex(str(tmp_path))
+    assert len(reader) == 5
+    assert reader.search(data[2], k=1)[0][0] == 2
+    # the writer finishes, the reader picks the rows up
+    writer.state["count"] = 10
+    writer._save_state()
+    reader.refresh()
+    assert reader.search(data[8], k=1)[0][0] == 8
+    assert reader.metadata(8)["path"] == "img8.jpg"
+
+
+def test_writer_drops_rows_of_an_interrupted_add(tmp_path):
+    index = CaseIndex(str(tmp_path), dim=8)
+    data = vectors(12)
+    index.add(data[:5], metas(0, 5))
+    interrupted_add(index, vectors(3, seed=1))
+
+    index = CaseIndex(str(tmp_path))
+    index.add(data[5:], metas(5, 7))
+    index = CaseIndex(str(tmp_path))
+    assert len(index) == 12
+    assert [m["path"] for m in index.iter_metadata()] == [f"img{i}.jpg" for i in range(12)]
+    for row in (4, 5, 11):
+        assert index.search(data[row], k=1)[0][0] == row
+        assert index.metadata(row)["path"] == f"img{row}.jpg"
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from fast_preprocess import DEFAULT_TOLERANCE, FastPreprocessor, check
+
+IMGS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "imgs")
+
+
+@pytest.fixture(scope="module")
+def image_processor():
+    transformers = pytest.importorskip("transformers")
+    # same settings as the DINOv2 checkpoint's preprocessor_config.json
+    return transformers.BitImageProcessor(
+        size={"shortest_edge": 256}, crop_size={"height": 224, "width": 224}, do_center_crop=True,
+        image_mean=[0.485, 0.456, 0.406], image_std=[0.229, 0.224, 0.225])
+
+
+def synthetic(width, height, seed, mode="RGB"):
+    rng = np.random.default_rng(seed)
+    image = Image.fromarray(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8))
+    return image.convert(mode)
+
+
+def test_matches_image_processor(image_processor):
+    images = [synthetic(w, h, i) for i, (w, h) in enumerate([(640, 480), (480, 640), (300, 300), (200, 120)])]
+    images.append(synthetic(400, 500, 9, mode="L"))
+    images += [Image.open(os.path.join(IMGS, name)).convert("RGB") for name in sorted(os.listdir(IMGS))]
+    assert check(image_processor, images) <= DEFAULT_TOLERANCE
+
+
+def test_batch_matches_single_images(image_processor):
+    fast = FastPreprocessor(image_processor)
+    images = [synthetic(320, 240, i) for i in range(3)]
+    batch = fast(images)
+    assert batch.shape == (3, 3, 224, 224)
+    for image, row in zip(images, batch):
+        assert torch.equal(fast([image])[0], row)
+
+
+def test_results_are_owned_by_the_caller(image_processor):
+    # a later call on the same thread must not overwrite an earlier result
+    fast = FastPreprocessor(image_processor)
+    first = fast([synthetic(256, 256, 1)])
+    snapshot = first.clone()
+    fast([synthetic(256, 256, 2)])
+    assert torch.equal(first, snapshot)
+
+
+def test_out_is_filled_in_place(image_processor):
+    fast = FastPreprocessor(image_processor)
+    images = [synthetic(256, 256, i) for i in range(2)]
+    out = torch.empty(4, 3, 224, 224)
+    result = fast(images, out=out)
+    assert result.data_ptr() == out.data_ptr()
+    assert torch.equal(result, fast(images))
+    with pytest.raises(ValueError):
+        fast(images, out=torch.empty(1, 3, 224, 224))
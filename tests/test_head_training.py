@@ -0,0 +1,27 @@
+import numpy as np
+
+from head_training import FeatureCache
+
+
+def test_resume_after_interrupted_write(tmp_path):
+    root = str(tmp_path / "cache")
+    cache = FeatureCache(root, "fp", dim=4)
+    cache.add(["a", "b"], np.ones((2, 4)))
+    # the run is killed halfway through writing the next index line
+    with open(cache._index_path, "a", encoding="utf-8") as f:
+        f.write('{"hash": "c", "chu')
+
+    cache = FeatureCache(root, "fp", dim=4)
+    assert set(cache.rows) == {"a", "b"}
+    cache.add(["c", "d"], np.full((2, 4), 2.0))
+
+    cache = FeatureCache(root, "fp", dim=4)
+    assert set(cache.rows) == {"a", "b", "c", "d"}
+    np.testing.assert_array_equal(cache.get(["b", "d"]), [[1.0] * 4, [2.0] * 4])
+
+
+def test_new_fingerprint_drops_the_cache(tmp_path):
+    root = str(tmp_path / "cache")
+    FeatureCache(root, "fp", dim=4).add(["a"], np.ones((1, 4)))
+    assert len(FeatureCache(root, "fp", dim=4)) == 1
+    assert len(FeatureCache(root, "other", dim=4)) == 0
@@ -0,0 +1,91 @@
+import threading
+from concurrent.futures import wait
+
+import pytest
+import torch
+
+from inference_server import MicroBatcher
+
+
+class SlowBackend:
+    """Logits = per-image pixel sum; blocks each forward pass until released."""
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.entered = threading.Event()
+
+    def __call__(self, pixel_values):
+        self.entered.set()
+        self.release.wait(5)
+        self.batches.append(pixel_values.shape[0])
+        return pixel_values.flatten(1).sum(dim=1, keepdim=True)
+
+
+def images(n, value):
+    return torch.full((n, 3, 2, 2), float(value))
+
+
+def test_concurrent_requests_share_a_forward_pass():
+    backend = SlowBackend()
+    batcher = MicroBatcher(lambda: backend, max_batch_size=8, max_wait_ms=50)
+    try:
+        # the worker is stuck in the first pass while the next requests queue up
+        first = batcher.submit(images(1, 1))
+        assert backend.entered.wait(5)
+        futures = [batcher.submit(images(1, v)) for v in range(2, 6)]
+        backend.release.set()
+        assert first.result(5).item() == 12
+        assert [f.result(5).item() for f in futures] == [12 * v for v in range(2, 6)]
+        assert backend.batches == [1, 4]
+        assert futures[0].batch_size == 4
+        assert batcher.stats()["requests"] == 5 and batcher.load() == 0
+    finally:
+        batcher.close(5)
+
+
+def test_request_that_does_not_fit_starts_the_next_batch():
+    backend = SlowBackend()
+    batcher = MicroBatcher(lambda: backend, max_batch_size=4, max_wait_ms=50)
+    try:
+        blocker = batcher.submit(images(1, 0))
+        assert backend.entered.wait(5)
+        a, b, c = batcher.submit(images(3, 1)), batcher.submit(images(3, 2)), batcher.submit(images(1, 3))
+        backend.release.set()
+        wait([blocker, a, b, c], timeout=5)
+        # b overflows a's batch and is held in _pending, c joins it
+        assert backend.batches == [1, 3, 4]
+        assert a.result().flatten().tolist() == [12] * 3
+        assert b.result().flatten().tolist() == [24] * 3
+        assert c.result().flatten().tolist() == [36]
+    finally:
+        batcher.close(5)
+
+
+def test_close_fails_queued_and_pending_requests():
+    backend = SlowBackend()
+    batcher = MicroBatcher(lambda: backend, max_batch_size=4, max_wait_ms=200)
+    running = batcher.submit(images(1, 1))
+    assert backend.entered.wait(5)
+    # while the first pass runs: a full batch, one that overflows it into _pending, one more queued
+    queued = [batcher.submit(images(4, 2)), batcher.submit(images(2, 3)), batcher.submit(images(1, 4))]
+    closer = threading.Thread(target=batcher.close, args=(5,))
+    closer.start()
+    assert batcher._closed.wait(5)
+    backend.release.set()
+    closer.join(5)
+    # the batch already running finishes, nothing else is started
+    assert running.result(5).item() == 12
+    assert backend.batches == [1]
+    for future in queued:
+        with pytest.raises(RuntimeError, match="closed"):
+            future.result(5)
+    assert batcher.load() == 0
+    with pytest.raises(RuntimeError):
+        batcher.submit(images(1, 5))
+
+
+def test_close_with_nothing_to_do():
+    batcher = MicroBatcher(lambda: SlowBackend())
+    batcher.close(5)
+    assert not batcher._worker.is_alive()
@@ -0,0 +1,25 @@
+import tta
+
+
+def test_views_shrink_under_queue_load():
+    policy = tta.TTAPolicy(max_views=8, budget_ms=250)
+    assert policy.views_for(queue_depth=10) == 8  # no estimate yet
+    # 8 views took 160 ms: 20 ms per view, the full 8 fit into 250 ms on an idle queue
+    policy.observe(0.16, 8)
+    assert policy.views_for(queue_depth=0) == 8
+    # 6 queued images ahead of us leave 130 ms, 6 views
+    assert policy.views_for(queue_depth=6) == 6
+    assert policy.views_for(queue_depth=100) == 1
+
+
+def test_estimate_follows_observations():
+    policy = tta.TTAPolicy(max_views=8, budget_ms=250, smoothing=0.5)
+    policy.observe(0.08, 8)
+    policy.observe(0.8, 8)
+    # (10 ms + 100 ms) / 2 per view
+    assert abs(policy.per_view - 0.055) < 1e-9
+    assert policy.views_for() == 4
+
+
+def test_policy_is_process_wide():
+    assert tta.get_policy() is tta.get_policy()
@@ -0,0 +1,133 @@
+"""Tiled inference for high-resolution and multi-lesion photos.
+
+The normal path shrinks the whole photo to the model's 224 px input, so on
+a full-body or wide-field shot a small lesion ends up a few pixels wide.
+Here the image is cut into overlapping tiles of the model's input size at
+native resolution (or at the smallest downscale that keeps the number of
+tiles within max_tiles), and all tiles plus the usual whole-image view go
+through the model as one batch. The per-tile logits are combined into an
+image-level result and a coarse heatmap of where the predicted class was
+found.
+
+Aggregation ("confidence" by default) weights every tile by its top-1
+probability, so the few tiles that show a lesion outweigh the many that
+show healthy skin or background; "mean" and "max" are there to compare.
+"""
+import math
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import torch
+from PIL import Image
+
+DEFAULT_MAX_TILES = int(os.environ.get("SKIN_TILE_MAX", 16))
+DEFAULT_OVERLAP = float(os.environ.get("SKIN_TILE_OVERLAP", 0.25))
+AGGREGATIONS = ("confidence", "mean", "max")
+
+
+def _axis(length, tile, stride):
+    """Start offsets of tiles covering [0, length), evenly spread, the last one flush with the end."""
+    if length <= tile:
+        return [0]
+    n = math.ceil((length - tile) / stride) + 1
+    return [round(i * (length - tile) / (n - 1)) for i in range(n)]
+
+
+def tile_grid(width, height, tile=224, overlap=DEFAULT_OVERLAP, max_tiles=DEFAULT_MAX_TILES):
+    """(scale, boxes): tile boxes in source pixels, covering the image with at most max_tiles tiles.
+
+    scale >= 1 is the source size of a tile divided by `tile`; it only grows
+    above 1 when native-resolution tiles would exceed max_tiles.
+    """
+    scale = 1.0
+    while True:
+        side = tile * scale
+        stride = max(1.0, side * (1 - overlap))
+        xs, ys = _axis(width, side, stride), _axis(height, side, stride)
+        if len(xs) * len(ys) <= max_tiles:
+            break
+        scale *= 1.1
+    side = round(side)
+    boxes = [(x, y, min(x + side, width), min(y + side, height)) for y in ys for x in xs]
+    return scale, boxes
+
+
+def decode_target(fast, max_tiles=DEFAULT_MAX_TILES, overlap=DEFAULT_OVERLAP):
+    """Callable for decode.decode(target=...): the smallest size at which tiles are still native."""
+    tile = min(fast.output_size)
+
+    def target(width, height):
+        scale, _ = tile_grid(width, height, tile, overlap, max_tiles)
+        return max(1, int(width / scale)), max(1, int(height / scale))
+    return target
+
+
+@dataclass
+class TiledResult:
+    logits: torch.Tensor        # (num_classes,) image-level
+    tile_logits: torch.Tensor   # (num_tiles, num_classes)
+    boxes: list                 # [(left, top, right, bottom)] in image pixels, one per tile
+    image_size: tuple
+    scale: float = 1.0
+    whole_image_logits: torch.Tensor = field(default=None, repr=False)
+
+    def heatmap(self, class_index):
+        """Per-tile probability of class_index as (rows, cols) following the tile layout."""
+        probs = self.tile_logits.softmax(-1)[:, class_index].numpy()
+        cols = len({box[0] for box in self.boxes})
+        return probs.reshape(-1, cols)
+
+    def overlay(self, image, class_index, alpha=0.5, resolution=64):
+        """The image with tiles tinted red in proportion to the probability of class_index."""
+        width, height = self.image_size
+        factor = max(width, height) / resolution
+        shape = (max(1, round(height / factor)), max(1, round(width / factor)))
+        total, count = np.zeros(shape, dtype=np.float32), np.zeros(shape, dtype=np.float32)
+        probs = self.tile_logits.softmax(-1)[:, class_index].numpy()
+        for (left, top, right, bottom), prob in zip(self.boxes, probs):
+            sl = np.s_[int(top / factor):math.ceil(bottom / factor), int(left / factor):math.ceil(right / factor)]
+            total[sl] += prob
+            count[sl] += 1
+        heat = total / np.maximum(count, 1)
+        heat = heat / max(float(heat.max()), 1e-6)
+        mask = Image.fromarray((heat * 255 * alpha).astype(np.uint8)).resize(image.size, Image.BILINEAR)
+        red = Image.new("RGB", image.size, (255, 0, 0))
+        return Image.composite(red, image.convert("RGB"), mask)
+
+
+def build_tiles(fast, image, max_tiles=DEFAULT_MAX_TILES, overlap=DEFAULT_OVERLAP):
+    """(pixel_values, scale, boxes): the whole-image view followed by every tile, normalized."""
+    crop_h, crop_w = fast.output_size
+    scale, boxes = tile_grid(*image.size, min(crop_h, crop_w), overlap, max_tiles)
+    arrays = [fast.prepare(image)]
+    for box in boxes:
+        tile = image.crop(box)
+        if tile.size != (crop_w, crop_h):
+            # edge tiles of small images and tiles of downscaled grids
+            tile = tile.resize((crop_w, crop_h), resample=fast.resample)
+        arrays.append(np.asarray(tile))
+    return fast.to_tensor(arrays), scale, boxes
+
+
+def aggregate(tile_logits, whole_image_logits, method="confidence"):
+    if method == "mean":
+        pooled = tile_logits.mean(dim=0)
+    elif method == "max":
+        pooled = tile_logits.max(dim=0).values
+    elif method == "confidence":
+        weights = tile_logits.softmax(-1).max(dim=-1).values
+        pooled = (weights[:, None] * tile_logits).sum(dim=0) / weights.sum()
+    else:
+        raise ValueError(f"unknown aggregation {method!r}, choose from {', '.join(AGGREGATIONS)}")
+    # the whole-image view keeps the global context (lesion distribution, body site)
+    return (pooled + whole_image_logits) / 2
+
+
+def predict(batcher, fast, image, max_tiles=DEFAULT_MAX_TILES, overlap=DEFAULT_OVERLAP, method="confidence"):
+    """Classify image from its tiles in one batched forward pass; returns a TiledResult."""
+    pixel_values, scale, boxes = build_tiles(fast, image, max_tiles, overlap)
+    logits = batcher.predict(pixel_values)
+    whole, tiles = logits[0], logits[1:]
+    return TiledResult(logits=aggregate(tiles, whole, method), tile_logits=tiles, boxes=boxes,
+                       image_size=image.size, scale=scale, whole_image_logits=whole)
@@ -0,0 +1,104 @@
+"""Test-time augmentation with a per-request latency budget.
+
+All views of an upload are built as one stacked (V, 3, H, W) tensor and go
+through the model in a single forward pass; their logits are averaged.
+Flips and rotations are taken from the already normalized center crop, the
+corner crops come from the same resized image, so the image is decoded and
+resized only once.
+
+The number of views adapts to load: TTAPolicy keeps a running estimate of
+the forward cost per view and of the time a request waits in the
+micro-batcher queue, and only uses as many views as fit into budget_ms.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import torch
+
+# views in the order they are added as the budget allows
+VIEWS = ("identity", "hflip", "crop_tl", "crop_br", "vflip", "crop_tr", "crop_bl", "rot90", "rot270", "rot180")
+DEFAULT_MAX_VIEWS = int(os.environ.get("SKIN_TTA_VIEWS", 0))
+DEFAULT_BUDGET_MS = float(os.environ.get("SKIN_TTA_BUDGET_MS", 250.0))
+
+
+def build_views(fast, image, views):
+    """Stack the named views of a PIL image into one normalized batch tensor."""
+    resized = np.asarray(fast.resize(image))
+    crop_h, crop_w = fast.output_size
+    height, width = resized.shape[:2]
+    corners = {
+        "crop_tl": (0, 0), "crop_tr": (0, width - crop_w),
+        "crop_bl": (height - crop_h, 0), "crop_br": (height - crop_h, width - crop_w),
+    }
+    top, left = (height - crop_h) // 2, (width - crop_w) // 2
+    crops = [resized[top:top + crop_h, left:left + crop_w]]
+    crop_views = [v for v in views if v in corners and height >= crop_h and width >= crop_w]
+    for view in crop_views:
+        y, x = corners[view]
+        crops.append(resized[y:y + crop_h, x:x + crop_w])
+    batch = fast.to_tensor(crops)
+    center = batch[0]
+
+    out, crop_index = [], {v: i + 1 for i, v in enumerate(crop_views)}
+    for view in views:
+        if view == "identity":
+            out.append(center)
+        elif view == "hflip":
+            out.append(center.flip(-1))
+        elif view == "vflip":
+            out.append(center.flip(-2))
+        elif view.startswith("rot"):
+            out.append(torch.rot90(center, int(view[3:]) // 90, dims=(-2, -1)))
+        elif view in crop_index:
+            out.append(batch[crop_index[view]])
+    return torch.stack(out)
+
+
+class TTAPolicy:
+    """Chooses how many views fit into the latency budget given current load."""
+
+    def __init__(self, max_views=DEFAULT_MAX_VIEWS, budget_ms=DEFAULT_BUDGET_MS, smoothing=0.2):
+        self.max_views = max(1, min(max_views, len(VIEWS)))
+        self.budget = budget_ms / 1000.0
+        self.smoothing = smoothing
+        self.per_view = None  # seconds of forward time per view (EMA)
+        self._lock = threading.Lock()
+
+    def views_for(self, queue_depth=0):
+        with self._lock:
+            if self.per_view is None:
+                return self.max_views
+            # queued images run before ours; leave them their share of the budget
+            available = self.budget - queue_depth * self.per_view
+            return max(1, min(self.max_views, int(available / self.per_view)))
+
+    def observe(self, seconds, views):
+        with self._lock:
+            sample = seconds / views
+            self.per_view = sample if self.per_view is None else (
+                (1 - self.smoothing) * self.per_view + self.smoothing * sample)
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_policy():
+    """Process-wide TTAPolicy, so its cost estimate carries over from one request to the next."""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = TTAPolicy()
+        return _policy
+
+
+def predict(batcher, fast, image, policy):
+    """Averaged logits over as many views as the budget allows; returns (logits, views used)."""
+    n = policy.views_for(batcher.queue_depth())
+    pixel_values = build_views(fast, image, VIEWS[:n])
+    start = time.perf_counter()
+    logits = batcher.predict(pixel_values)
+    policy.observe(time.perf_counter() - start, len(pixel_values))
+    return logits.mean(dim=0), len(pixel_values)